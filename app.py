@@ -4,11 +4,20 @@ Dashboard ZAN - Version Flask responsive
 Application Web Service pour déploiement sur Render
 """
 
-from flask import Flask, render_template, jsonify, request
-import pandas as pd
+from flask import Flask, render_template, jsonify, request, make_response
 import numpy as np
 from pathlib import Path
-import requests
+from functools import lru_cache
+import os
+import threading
+
+from utils.schema import COLS_MESURES, read_observatoire_csv
+from utils.hierarchy import build_hierarchy
+from utils.quality import detect_units, run_quality_checks
+from utils.query_log import QueryLog, TinyLFUCache
+from utils.search import CommuneIndex
+from utils.ingest import DEFAULT_OUTPUT_DIR as PERIMETRES_DIR, MANIFEST_NAME, load_manifest
+from utils.report import RENDERERS, build_report_html
 
 app = Flask(__name__)
 
@@ -20,52 +29,254 @@ def load_data():
     """Charge les données des deux périmètres"""
     base_path = Path(__file__).parent / "data"
     
-    df_scot = pd.read_csv(base_path / "data_scot_rives_du_rhone.csv", sep=";", encoding="utf-8-sig", low_memory=False)
-    df_cc = pd.read_csv(base_path / "data_cc_porte_dromeardeche.csv", sep=";", encoding="utf-8-sig", low_memory=False)
-    
-    df_scot = prepare_data(df_scot)
-    df_cc = prepare_data(df_cc)
+    df_scot = read_observatoire_csv(base_path / "data_scot_rives_du_rhone.csv")
+    df_cc = read_observatoire_csv(base_path / "data_cc_porte_dromeardeche.csv")
     
     return df_scot, df_cc
 
 
-def prepare_data(df):
-    """Prépare et nettoie les données"""
-    numeric_cols = [
-        "naf09art24", "art09act24", "art09hab24", "art09mix24",
-        "art09rou24", "art09fer24", "art09inc24",
-        "pop15", "pop21", "pop1521",
-        "men15", "men21", "men1521",
-        "emp15", "emp21", "emp1521",
-        "surfcom2024",
-    ]
+# Périmètres intégrés à l'application (les autres viennent du manifeste d'ingestion)
+PERIMETRES_LABELS = {
+    "scot": "SCoT des Rives du Rhône",
+    "ccpda": "CC Porte de DrômArdèche",
+}
+
+# Données intégrées : chargées par init_data() (via create_app() ou à la première
+# requête), et non à l'import du module
+DF_SCOT, DF_CC = None, None
+HIERARCHIES = {}
+QUALITY_REPORTS = {}
+SEARCH_INDEXES = {}
+DATA_LOADED = False
+
+_INIT_LOCK = threading.Lock()
+_INITIALIZED = False
+
+
+def init_data():
+    """
+    Charge les données intégrées et construit les structures dérivées (une seule fois)
+
+    Returns:
+        True si les données sont chargées
+    """
+    global DF_SCOT, DF_CC, HIERARCHIES, QUALITY_REPORTS, SEARCH_INDEXES, DATA_LOADED, _INITIALIZED
+    with _INIT_LOCK:
+        if _INITIALIZED:
+            return DATA_LOADED
+        try:
+            DF_SCOT, DF_CC = load_data()
+            # Arbres d'agrégation hiérarchique, construits une fois pour toutes
+            HIERARCHIES = {
+                "scot": build_hierarchy(DF_SCOT, PERIMETRES_LABELS["scot"]),
+                "ccpda": build_hierarchy(DF_CC, PERIMETRES_LABELS["ccpda"]),
+            }
+            # Contrôle qualité des flux annuels, exécuté une fois au chargement
+            QUALITY_REPORTS = {
+                "scot": run_quality_checks(DF_SCOT),
+                "ccpda": run_quality_checks(DF_CC),
+            }
+            # Index de recherche des communes (autocomplétion)
+            SEARCH_INDEXES = {
+                "scot": CommuneIndex(DF_SCOT),
+                "ccpda": CommuneIndex(DF_CC),
+            }
+            DATA_LOADED = True
+        except Exception as e:
+            print(f"Erreur chargement données: {e}")
+            DF_SCOT, DF_CC = None, None
+            HIERARCHIES = {}
+            QUALITY_REPORTS = {}
+            SEARCH_INDEXES = {}
+            DATA_LOADED = False
+        
+        # Préchargement des requêtes historiquement les plus fréquentes
+        if DATA_LOADED:
+            warm_up_cache()
+        _INITIALIZED = True
+    return DATA_LOADED
+
+
+@lru_cache(maxsize=1)
+def _read_manifest(mtime):
+    """Lecture du manifeste, mise en cache par date de modification"""
+    return load_manifest(PERIMETRES_DIR)
+
+
+@lru_cache(maxsize=32)
+def _load_perimetre(fichier, mtime):
+    """Chargement d'un instantané de périmètre, mis en cache par version du manifeste"""
+    return read_observatoire_csv(PERIMETRES_DIR / fichier)
+
+
+@lru_cache(maxsize=32)
+def _load_perimetre_hierarchy(fichier, mtime, label):
+    """Arbre d'agrégation d'un instantané de périmètre, construit au premier accès"""
+    return build_hierarchy(_load_perimetre(fichier, mtime), label)
+
+
+@lru_cache(maxsize=32)
+def _load_perimetre_quality(fichier, mtime):
+    """Rapport de contrôle qualité d'un instantané de périmètre, calculé au premier accès"""
+    return run_quality_checks(_load_perimetre(fichier, mtime))
+
+
+@lru_cache(maxsize=32)
+def _load_perimetre_search_index(fichier, mtime):
+    """Index de recherche des communes d'un instantané de périmètre, construit au premier accès"""
+    return CommuneIndex(_load_perimetre(fichier, mtime))
+
+
+def _manifest_mtime():
+    """Date de modification du manifeste, None s'il n'existe pas"""
+    try:
+        return (PERIMETRES_DIR / MANIFEST_NAME).stat().st_mtime
+    except OSError:
+        return None
+
+
+def get_manifest():
+    """Retourne le manifeste des périmètres ingérés, ou None s'il n'existe pas"""
+    mtime = _manifest_mtime()
+    if mtime is None:
+        return None
+    return _read_manifest(mtime)
+
+
+def get_perimetre_entry(perimetre):
+    """Retourne l'entrée du manifeste correspondant à un identifiant de périmètre"""
+    manifest = get_manifest()
+    if manifest is None:
+        return None
+    for entry in manifest["perimetres"]:
+        if entry["id"] == perimetre:
+            return entry
+    return None
+
+
+def get_perimetre_data(perimetre):
+    """Retourne le DataFrame complet d'un périmètre"""
+    if perimetre == "scot":
+        return DF_SCOT
+    if perimetre in PERIMETRES_LABELS:
+        return DF_CC
+    
+    entry = get_perimetre_entry(perimetre)
+    if entry is None:
+        return DF_CC
+    try:
+        return _load_perimetre(entry["fichier"], _manifest_mtime())
+    except Exception as e:
+        print(f"Erreur chargement périmètre {perimetre}: {e}")
+        return None
+
+
+def get_perimetre_hierarchy(perimetre):
+    """Retourne l'arbre d'agrégation hiérarchique d'un périmètre"""
+    if perimetre in PERIMETRES_LABELS:
+        return HIERARCHIES.get(perimetre)
+    
+    entry = get_perimetre_entry(perimetre)
+    if entry is None:
+        return HIERARCHIES.get("ccpda")
+    try:
+        return _load_perimetre_hierarchy(entry["fichier"], _manifest_mtime(), entry["label"])
+    except Exception as e:
+        print(f"Erreur chargement périmètre {perimetre}: {e}")
+        return None
+
+
+def get_perimetre_quality(perimetre):
+    """Retourne le rapport de contrôle qualité d'un périmètre"""
+    if perimetre in PERIMETRES_LABELS:
+        return QUALITY_REPORTS.get(perimetre)
     
-    # Colonnes annuelles
-    for year_start in range(9, 24):
-        for year_end in range(10, 25):
-            if year_end == year_start + 1:
-                col = f"naf{year_start:02d}art{year_end:02d}"
-                if col not in numeric_cols:
-                    numeric_cols.append(col)
+    entry = get_perimetre_entry(perimetre)
+    if entry is None:
+        return QUALITY_REPORTS.get("ccpda")
+    try:
+        return _load_perimetre_quality(entry["fichier"], _manifest_mtime())
+    except Exception as e:
+        print(f"Erreur chargement périmètre {perimetre}: {e}")
+        return None
+
+
+def get_perimetre_units(perimetre):
+    """
+    Unités (m² ou hectares) des colonnes de flux totaux d'un périmètre
     
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    L'unité est une propriété du fichier source : elle est lue dans le rapport
+    qualité, calculé sur le périmètre complet, et jamais redétectée sur une
+    sélection filtrée (une destination peu représentée y passerait pour des hectares).
+    """
+    rapport = get_perimetre_quality(perimetre)
+    if rapport is not None:
+        return rapport["unites"]
+    df = get_perimetre_data(perimetre)
+    return detect_units(df) if df is not None else {}
+
+
+def get_perimetre_search_index(perimetre):
+    """Retourne l'index de recherche des communes d'un périmètre"""
+    if perimetre in PERIMETRES_LABELS:
+        return SEARCH_INDEXES.get(perimetre)
+    
+    entry = get_perimetre_entry(perimetre)
+    if entry is None:
+        return SEARCH_INDEXES.get("ccpda")
+    try:
+        return _load_perimetre_search_index(entry["fichier"], _manifest_mtime())
+    except Exception as e:
+        print(f"Erreur chargement périmètre {perimetre}: {e}")
+        return None
+
+
+def get_perimetres():
+    """Liste des périmètres disponibles : intégrés puis issus du manifeste"""
+    perimetres = [
+        {"id": pid, "niveau": "integre", "label": label}
+        for pid, label in PERIMETRES_LABELS.items()
+    ]
     
-    if "artif_total_ha" not in df.columns:
-        df["artif_total_ha"] = df.get("naf09art24", 0) / 10000
+    manifest = get_manifest()
+    if manifest is not None:
+        for entry in manifest["perimetres"]:
+            perimetres.append({
+                "id": entry["id"],
+                "niveau": entry["niveau"],
+                "label": entry["label"],
+                "nb_communes": entry["nb_communes"],
+                "population": entry["population"],
+            })
     
-    return df
+    return perimetres
+
 
+def list_perimetres():
+    """Identifiants de tous les périmètres disponibles"""
+    return [p["id"] for p in get_perimetres()]
 
-# Charger les données au démarrage
-try:
-    DF_SCOT, DF_CC = load_data()
-    DATA_LOADED = True
-except Exception as e:
-    print(f"Erreur chargement données: {e}")
-    DF_SCOT, DF_CC = None, None
-    DATA_LOADED = False
+
+def get_data_version():
+    """Version des données : dates de modification des fichiers sources et du manifeste"""
+    base_path = Path(__file__).parent / "data"
+    fichiers = ["data_scot_rives_du_rhone.csv", "data_cc_porte_dromeardeche.csv"]
+    version = []
+    for fichier in fichiers:
+        try:
+            version.append((base_path / fichier).stat().st_mtime_ns)
+        except OSError:
+            version.append(None)
+    version.append(_manifest_mtime())
+    return tuple(version)
+
+
+def get_perimetre_label(perimetre):
+    """Retourne le libellé d'un périmètre"""
+    if perimetre in PERIMETRES_LABELS:
+        return PERIMETRES_LABELS[perimetre]
+    entry = get_perimetre_entry(perimetre)
+    return entry["label"] if entry else PERIMETRES_LABELS["ccpda"]
 
 
 # ============================================
@@ -74,13 +285,18 @@ except Exception as e:
 
 def apply_filters(df, departements=None, communes=None, typologies=None):
     """Applique les filtres au DataFrame"""
-    df_filtered = df.copy()
+    return df[filter_mask(df, departements, communes, typologies)]
+
+
+def filter_mask(df, departements=None, communes=None, typologies=None):
+    """Masque booléen des lignes retenues par les filtres"""
+    mask = np.ones(len(df), dtype=bool)
     
     if departements:
-        df_filtered = df_filtered[df_filtered["iddeptxt"].isin(departements)]
+        mask &= df["iddeptxt"].isin(departements).to_numpy()
     
     if communes:
-        df_filtered = df_filtered[df_filtered["idcomtxt"].isin(communes)]
+        mask &= df["idcomtxt"].isin(communes).to_numpy()
     
     if typologies:
         # Convertir les labels en codes
@@ -91,41 +307,104 @@ def apply_filters(df, departements=None, communes=None, typologies=None):
             "Hors attraction": "30"
         }
         codes = [typo_codes.get(t, t) for t in typologies]
-        df_filtered = df_filtered[df_filtered["aav2020_typo"].astype(str).isin(codes)]
+        mask &= df["aav2020_typo"].isin(codes).to_numpy()
+    
+    return mask
+
+
+# Journal des filtres demandés (ZAN_QUERY_LOG vide : journal en mémoire uniquement)
+QUERY_LOG = QueryLog(os.environ.get("ZAN_QUERY_LOG", Path(__file__).parent / "logs" / "queries.jsonl"))
+# Cache des DataFrames filtrés, admission selon la popularité observée des filtres
+FILTER_CACHE = TinyLFUCache(capacity=64)
+
+
+def _filter_key(perimetre, departements=None, communes=None, typologies=None):
+    """Clé canonique d'une combinaison de filtres"""
+    return (
+        perimetre,
+        tuple(sorted(departements or [])),
+        tuple(sorted(communes or [])),
+        tuple(sorted(typologies or [])),
+    )
+
+
+def _cache_key(key):
+    """Clé de cache : filtres + version de l'instantané pour les périmètres ingérés"""
+    return key + (None if key[0] in PERIMETRES_LABELS else _manifest_mtime(),)
+
+
+def record_query(perimetre, departements=None, communes=None, typologies=None):
+    """
+    Enregistre une combinaison de filtres demandée par un client HTTP
     
-    return df_filtered
+    Appelée par les routes uniquement (une fois par requête) : les appels internes
+    à get_filtered_data (rapports, rendus SVG, batch) ne faussent pas les statistiques
+    de popularité qui pilotent le préchargement du cache.
+    """
+    QUERY_LOG.record(_filter_key(perimetre, departements, communes, typologies))
 
 
 def get_filtered_data(perimetre, departements=None, communes=None, typologies=None):
     """Retourne le DataFrame filtré selon les critères"""
-    df = DF_SCOT if perimetre == "scot" else DF_CC
+    key = _filter_key(perimetre, departements, communes, typologies)
+    return FILTER_CACHE.get(_cache_key(key), lambda: _compute_filtered_data(*key))
+
+
+def _compute_filtered_data(perimetre, departements, communes, typologies):
+    df = get_perimetre_data(perimetre)
     
     if df is None:
         return None
     
-    return apply_filters(df, departements, communes, typologies)
+    return apply_filters(df, list(departements), list(communes), list(typologies))
+
+
+def warm_up_cache(n=16):
+    """Précharge et épingle dans le cache les n combinaisons de filtres les plus demandées"""
+    nb = 0
+    for key, _ in QUERY_LOG.top_queries(n):
+        try:
+            perimetre, departements, communes, typologies = key
+            df = _compute_filtered_data(perimetre, departements, communes, typologies)
+        except Exception as e:
+            print(f"Erreur préchargement {key}: {e}")
+            continue
+        if df is not None and FILTER_CACHE.put(_cache_key(key), df, pin=True):
+            nb += 1
+    return nb
 
 
 # ============================================
 # FONCTIONS DE CALCUL
 # ============================================
 
+def column_sums(df):
+    """Sommes des colonnes de mesures (flux en m² et effectifs) d'un DataFrame"""
+    cols = [c for c in COLS_MESURES if c in df.columns]
+    return dict(zip(cols, df[cols].to_numpy(dtype=np.int64).sum(axis=0).tolist()))
+
+
 def calculate_metrics(df):
     """Calcule les métriques principales"""
+    return calculate_metrics_from_sums(column_sums(df), len(df))
+
+
+def calculate_metrics_from_sums(sums, nb_communes):
+    """Calcule les métriques principales à partir des sommes des mesures d'un groupe de communes"""
     metrics = {}
     
     # Artificialisation totale
-    metrics["artif_total_ha"] = df["naf09art24"].sum() / 10000
+    metrics["artif_total_ha"] = sums["naf09art24"] / 10000
     
     # Par destination
-    metrics["artif_habitat_ha"] = df.get("art09hab24", pd.Series([0])).sum() / 10000
-    metrics["artif_activites_ha"] = df.get("art09act24", pd.Series([0])).sum() / 10000
-    metrics["artif_mixte_ha"] = df.get("art09mix24", pd.Series([0])).sum() / 10000
-    metrics["artif_routes_ha"] = df.get("art09rou24", pd.Series([0])).sum() / 10000
+    metrics["artif_habitat_ha"] = sums.get("art09hab24", 0) / 10000
+    metrics["artif_activites_ha"] = sums.get("art09act24", 0) / 10000
+    metrics["artif_mixte_ha"] = sums.get("art09mix24", 0) / 10000
+    metrics["artif_routes_ha"] = sums.get("art09rou24", 0) / 10000
     
     # Population
-    metrics["population"] = int(df["pop21"].sum())
-    metrics["evolution_pop"] = int(df["pop1521"].sum())
+    metrics["population"] = int(sums["pop21"])
+    metrics["evolution_pop"] = int(sums["pop1521"])
     
     # Efficience : m² d'artificialisation par nouveau habitant (2015-2021)
     # = (Artificialisation 2015-2021 en m²) / (Évolution population 2015-2021)
@@ -141,7 +420,7 @@ def calculate_metrics(df):
     
     # Calculer l'artificialisation sur la période 2015-2021 (cohérent avec pop1521)
     cols_artif_1521 = ["naf15art16", "naf16art17", "naf17art18", "naf18art19", "naf19art20", "naf20art21"]
-    artif_1521 = sum(df[col].sum() for col in cols_artif_1521 if col in df.columns)
+    artif_1521 = sum(sums[col] for col in cols_artif_1521 if col in sums)
     
     if metrics["evolution_pop"] > 0:
         metrics["conso_par_hab"] = artif_1521 / metrics["evolution_pop"]
@@ -152,13 +431,13 @@ def calculate_metrics(df):
     cols_ref = ["naf11art12", "naf12art13", "naf13art14", "naf14art15", "naf15art16",
                 "naf16art17", "naf17art18", "naf18art19", "naf19art20", "naf20art21"]
     
-    conso_ref = sum(df[col].sum() / 10000 for col in cols_ref if col in df.columns)
+    conso_ref = sum(sums[col] / 10000 for col in cols_ref if col in sums)
     metrics["conso_reference"] = conso_ref
     metrics["enveloppe_zan"] = conso_ref * 0.5
     
     # Consommation récente
     cols_recent = ["naf21art22", "naf22art23", "naf23art24"]
-    conso_recent = sum(df[col].sum() / 10000 for col in cols_recent if col in df.columns)
+    conso_recent = sum(sums[col] / 10000 for col in cols_recent if col in sums)
     metrics["conso_2021_2024"] = conso_recent
     metrics["reste_disponible"] = max(0, metrics["enveloppe_zan"] - conso_recent)
     
@@ -169,13 +448,18 @@ def calculate_metrics(df):
         metrics["taux_enveloppe"] = 0
     
     # Nombre de communes
-    metrics["nb_communes"] = len(df)
+    metrics["nb_communes"] = nb_communes
     
     return metrics
 
 
 def get_evolution_data(df):
     """Données pour le graphique d'évolution annuelle - CORRIGÉ pour correspondre à Streamlit"""
+    return get_evolution_data_from_sums(column_sums(df))
+
+
+def get_evolution_data_from_sums(sums):
+    """Données d'évolution annuelle à partir des sommes des mesures d'un groupe de communes"""
     # Utiliser les années 2010-2024 comme dans Streamlit
     cols_annuelles = [
         ("naf09art10", "2010"),
@@ -199,8 +483,8 @@ def get_evolution_data(df):
     consommations = []
     
     for col, annee in cols_annuelles:
-        if col in df.columns:
-            val = df[col].sum() / 10000
+        if col in sums:
+            val = sums[col] / 10000
             periodes.append(annee)
             consommations.append(round(val, 2))
     
@@ -209,6 +493,8 @@ def get_evolution_data(df):
 
 def get_repartition_data(df):
     """Données pour le graphique de répartition par destination"""
+    import pandas as pd
+    
     data = {
         "Habitat": round(df.get("art09hab24", pd.Series([0])).sum() / 10000, 2),
         "Activités": round(df.get("art09act24", pd.Series([0])).sum() / 10000, 2),
@@ -218,17 +504,16 @@ def get_repartition_data(df):
     return data
 
 
-def get_top_communes(df, n=10):
-    """Top N communes les plus artificialisées"""
+def get_top_communes(df, units, n=10):
+    """Top N communes les plus artificialisées (units : voir get_perimetre_units)"""
     cols_needed = ["idcom", "idcomtxt", "artif_total_ha", "art09hab24", "art09act24", "art09mix24", "art09rou24"]
     cols_available = [c for c in cols_needed if c in df.columns]
     
     df_top = df.nlargest(n, "artif_total_ha")[cols_available].copy()
     
     for col in ["art09hab24", "art09act24", "art09mix24", "art09rou24"]:
-        if col in df_top.columns:
-            if df_top[col].max() > 1000:
-                df_top[col] = df_top[col] / 10000
+        if col in df_top.columns and units.get(col) == "m2":
+            df_top[col] = df_top[col] / 10000
     
     result = []
     for _, row in df_top.iterrows():
@@ -254,25 +539,16 @@ def get_typologie_data(df):
         "30": "Hors attraction (rural)",
     }
     
-    df_copy = df.copy()
-    df_copy["typo_label"] = df_copy["aav2020_typo"].astype(str).map(typo_labels).fillna("Autre")
+    # Agrégation sur les codes (catégories), puis regroupement par libellé
+    cols_artif_1521 = ["naf15art16", "naf16art17", "naf17art18", "naf18art19", "naf19art20", "naf20art21"]
+    df_calc = df[["aav2020_typo", "naf09art24", "art09hab24", "art09act24", "art09mix24", "art09rou24", "pop1521"]].copy()
     
     # Calculer l'artificialisation 2015-2021 pour chaque ligne (cohérent avec pop1521)
-    cols_artif_1521 = ["naf15art16", "naf16art17", "naf17art18", "naf18art19", "naf19art20", "naf20art21"]
-    df_copy["artif_1521"] = 0
-    for col in cols_artif_1521:
-        if col in df_copy.columns:
-            df_copy["artif_1521"] += df_copy[col]
-    
-    agg = df_copy.groupby("typo_label").agg({
-        "naf09art24": "sum",  # Pour l'affichage total (2009-2024)
-        "art09hab24": "sum",
-        "art09act24": "sum",
-        "art09mix24": "sum",
-        "art09rou24": "sum",
-        "artif_1521": "sum",  # Artificialisation 2015-2021 pour l'efficience
-        "pop1521": "sum",
-    }).reset_index()
+    df_calc["artif_1521"] = df[[c for c in cols_artif_1521 if c in df.columns]].astype(np.int64).sum(axis=1)
+    
+    agg_codes = df_calc.groupby("aav2020_typo", observed=True, dropna=False).sum()
+    labels = agg_codes.index.astype(object).map(typo_labels).fillna("Autre")
+    agg = agg_codes.groupby(labels).sum().rename_axis("typo_label").reset_index()
     
     # Conversion en hectares
     for col in ["naf09art24", "art09hab24", "art09act24", "art09mix24", "art09rou24"]:
@@ -506,16 +782,15 @@ def get_benchmark_data():
     }
 
 
-def get_communes_table(df):
-    """Données pour le tableau des communes"""
+def get_communes_table(df, units):
+    """Données pour le tableau des communes (units : voir get_perimetre_units)"""
     cols = ["idcomtxt", "iddeptxt", "pop21", "artif_total_ha", "art09hab24", "art09act24"]
     df_table = df[cols].copy()
     
     # Conversion
     for col in ["art09hab24", "art09act24"]:
-        if col in df_table.columns:
-            if df_table[col].max() > 1000:
-                df_table[col] = df_table[col] / 10000
+        if col in df_table.columns and units.get(col) == "m2":
+            df_table[col] = df_table[col] / 10000
     
     df_table = df_table.rename(columns={
         "idcomtxt": "commune",
@@ -535,6 +810,103 @@ def get_communes_table(df):
     return df_table.sort_values("total_ha", ascending=False).to_dict("records")
 
 
+def compare_groups(df, groupes):
+    """
+    Métriques et évolution de K groupes de communes en une seule passe
+    
+    La matrice d'appartenance (K x communes) est multipliée par la matrice des
+    mesures (communes x mesures) : les sommes des K groupes sortent d'un seul
+    produit matriciel, sans copier ni refiltrer le DataFrame par groupe.
+    """
+    cols = [c for c in COLS_MESURES if c in df.columns]
+    
+    appartenance = np.vstack([
+        filter_mask(df, g.get("departements"), g.get("communes"), g.get("typologies"))
+        for g in groupes
+    ])
+    # Produit en flottants (BLAS) : exact tant que les sommes restent sous 2**53
+    sommes = appartenance.astype(np.float64) @ df[cols].to_numpy(dtype=np.float64)
+    sommes = np.rint(sommes).astype(np.int64)
+    nb_communes = appartenance.sum(axis=1)
+    
+    result = []
+    for groupe, ligne, nb in zip(groupes, sommes, nb_communes):
+        sums = dict(zip(cols, ligne.tolist()))
+        result.append({
+            "nom": groupe["nom"],
+            "metrics": calculate_metrics_from_sums(sums, int(nb)),
+            "evolution": get_evolution_data_from_sums(sums),
+        })
+    
+    return result
+
+
+# ============================================
+# RENDU SERVEUR DES GRAPHIQUES
+# ============================================
+
+def get_panel_data(panel, df):
+    """Données d'un panneau du tableau de bord pour un DataFrame filtré"""
+    if panel == "trajectory":
+        return get_trajectory_data(df)
+    if panel == "evolution":
+        return get_evolution_data(df)
+    if panel == "repartition":
+        return get_repartition_data(df)
+    if panel == "radar":
+        return get_benchmark_data()
+    raise KeyError(panel)
+
+
+@lru_cache(maxsize=256)
+def _render_panel_cached(panel, perimetre, departements, communes, typologies, version):
+    """Rendu SVG mis en cache par panneau, filtres et version des données"""
+    df = get_filtered_data(perimetre, list(departements), list(communes), list(typologies))
+    
+    if df is None or len(df) == 0:
+        return None
+    
+    data = get_panel_data(panel, df)
+    return RENDERERS[panel](data) if data is not None else None
+
+
+def render_panel(panel, perimetre, departements=None, communes=None, typologies=None):
+    """
+    Rend un panneau en SVG pour un jeu de filtres
+    
+    Returns:
+        Document SVG, ou None si aucune donnée ne correspond aux filtres
+    """
+    return _render_panel_cached(
+        panel, perimetre,
+        tuple(sorted(departements or [])),
+        tuple(sorted(communes or [])),
+        tuple(sorted(typologies or [])),
+        get_data_version(),
+    )
+
+
+def render_report(perimetre, departements=None, communes=None, typologies=None):
+    """Rapport HTML statique (KPIs + tous les panneaux en SVG) d'un périmètre"""
+    from utils.metadata import get_footer_text
+    
+    df = get_filtered_data(perimetre, departements, communes, typologies)
+    
+    if df is None or len(df) == 0:
+        return None
+    
+    svgs = {}
+    for panel in RENDERERS:
+        # Le radar compare toujours SCoT et CCPDA : sans objet pour un périmètre ingéré
+        if panel == "radar" and perimetre not in PERIMETRES_LABELS:
+            continue
+        svg = render_panel(panel, perimetre, departements, communes, typologies)
+        if svg is not None:
+            svgs[panel] = svg
+    
+    return build_report_html(get_perimetre_label(perimetre), calculate_metrics(df), svgs, get_footer_text())
+
+
 # ============================================
 # ROUTES
 # ============================================
@@ -551,7 +923,7 @@ def api_filter_options():
     perimetre = request.args.get("perimetre", "scot")
     departements = request.args.getlist("departements")
     
-    df = DF_SCOT if perimetre == "scot" else DF_CC
+    df = get_perimetre_data(perimetre)
     
     if df is None:
         return jsonify({"departements": [], "communes": [], "typologies": []})
@@ -573,8 +945,9 @@ def api_filter_options():
         "30": "Hors attraction"
     }
     typologies_list = []
+    codes_presents = set(df["aav2020_typo"].dropna().unique())
     for code, label in typo_labels.items():
-        if code in df["aav2020_typo"].astype(str).values:
+        if code in codes_presents:
             typologies_list.append(label)
     
     return jsonify({
@@ -584,6 +957,46 @@ def api_filter_options():
     })
 
 
+@app.route("/api/perimetres")
+def api_perimetres():
+    """API: Périmètres disponibles (intégrés + issus de l'ingestion nationale)"""
+    return jsonify(get_perimetres())
+
+
+@app.route("/api/drilldown")
+def api_drilldown():
+    """API: Métriques d'un nœud de la hiérarchie territoriale et de ses enfants"""
+    perimetre = request.args.get("perimetre", "scot")
+    node_id = request.args.get("node", 0, type=int)
+    
+    hierarchy = get_perimetre_hierarchy(perimetre)
+    
+    if hierarchy is None:
+        return jsonify({"error": "Données non disponibles"}), 500
+    
+    node = hierarchy.get(node_id)
+    
+    if node is None:
+        return jsonify({"error": "Nœud inconnu"}), 404
+    
+    def node_data(n):
+        data = calculate_metrics_from_sums(n.totaux(hierarchy.columns), n.nb_communes)
+        data.update({
+            "id": n.id,
+            "niveau": n.niveau,
+            "code": n.code,
+            "label": n.label,
+            "nb_enfants": len(n.children),
+        })
+        return data
+    
+    return jsonify({
+        "node": node_data(node),
+        "children": [node_data(child) for child in node.children],
+        "chemin": [{"id": n.id, "niveau": n.niveau, "label": n.label} for n in node.chemin()],
+    })
+
+
 @app.route("/api/metrics")
 def api_metrics():
     """API: Métriques principales avec filtres"""
@@ -592,13 +1005,14 @@ def api_metrics():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
         return jsonify({"error": "Données non disponibles"}), 500
     
     metrics = calculate_metrics(df)
-    metrics["perimetre"] = "SCoT des Rives du Rhône" if perimetre == "scot" else "CC Porte de DrômArdèche"
+    metrics["perimetre"] = get_perimetre_label(perimetre)
     
     # Ajouter résumé de sélection
     metrics["nb_communes_filtrees"] = len(df)
@@ -608,6 +1022,54 @@ def api_metrics():
     return jsonify(metrics)
 
 
+# Nombre maximal de groupes comparés en une requête
+MAX_GROUPES_COMPARAISON = 100
+
+
+@app.route("/api/compare", methods=["POST"])
+def api_compare():
+    """API: Comparaison de K groupes de communes (filtres nommés) en un appel"""
+    payload = request.get_json(silent=True)
+    
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Objet JSON requis"}), 400
+    
+    perimetre = payload.get("perimetre", "scot")
+    groupes = payload.get("groupes")
+    
+    if not isinstance(perimetre, str):
+        return jsonify({"error": "Périmètre invalide"}), 400
+    
+    if not isinstance(groupes, list) or not groupes:
+        return jsonify({"error": "Liste de groupes requise"}), 400
+    
+    if len(groupes) > MAX_GROUPES_COMPARAISON:
+        return jsonify({"error": f"Maximum {MAX_GROUPES_COMPARAISON} groupes par requête"}), 400
+    
+    normalises = []
+    for i, groupe in enumerate(groupes):
+        if not isinstance(groupe, dict):
+            return jsonify({"error": f"Groupe {i + 1} invalide"}), 400
+        normalise = {"nom": str(groupe.get("nom") or f"Groupe {i + 1}")}
+        for champ in ("departements", "communes", "typologies"):
+            valeurs = groupe.get(champ) or []
+            # Une chaîne seule serait parcourue caractère par caractère : listes de chaînes uniquement
+            if not isinstance(valeurs, list) or not all(isinstance(v, str) for v in valeurs):
+                return jsonify({"error": f"Groupe {i + 1} : {champ} doit être une liste de chaînes"}), 400
+            normalise[champ] = valeurs
+        normalises.append(normalise)
+    
+    df = get_perimetre_data(perimetre)
+    
+    if df is None or len(df) == 0:
+        return jsonify({"error": "Données non disponibles"}), 500
+    
+    return jsonify({
+        "perimetre": get_perimetre_label(perimetre),
+        "groupes": compare_groups(df, normalises),
+    })
+
+
 @app.route("/api/evolution")
 def api_evolution():
     """API: Données d'évolution annuelle avec filtres"""
@@ -616,6 +1078,7 @@ def api_evolution():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
@@ -632,6 +1095,7 @@ def api_repartition():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
@@ -649,12 +1113,13 @@ def api_top_communes():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
         return jsonify({"error": "Données non disponibles"}), 500
     
-    return jsonify(get_top_communes(df, n))
+    return jsonify(get_top_communes(df, get_perimetre_units(perimetre), n))
 
 
 @app.route("/api/typologie")
@@ -665,6 +1130,7 @@ def api_typologie():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
@@ -681,6 +1147,7 @@ def api_trajectory():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
@@ -698,6 +1165,7 @@ def api_risques():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
@@ -714,6 +1182,7 @@ def api_densification():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
@@ -741,12 +1210,58 @@ def api_communes():
     communes = request.args.getlist("communes")
     typologies = request.args.getlist("typologies")
     
+    record_query(perimetre, departements, communes, typologies)
     df = get_filtered_data(perimetre, departements, communes, typologies)
     
     if df is None or len(df) == 0:
         return jsonify({"error": "Données non disponibles"}), 500
     
-    return jsonify(get_communes_table(df))
+    return jsonify(get_communes_table(df, get_perimetre_units(perimetre)))
+
+
+@app.route("/api/qualite")
+def api_qualite():
+    """API: Rapport de contrôle qualité des flux annuels (anomalies, cohérence, unités)"""
+    perimetre = request.args.get("perimetre", "scot")
+    
+    report = get_perimetre_quality(perimetre)
+    
+    if report is None:
+        return jsonify({"error": "Données non disponibles"}), 500
+    
+    return jsonify(report)
+
+
+@app.route("/api/requetes")
+def api_requetes():
+    """API: Combinaisons de filtres les plus demandées et état du cache"""
+    n = request.args.get("n", 20, type=int)
+    top = [
+        {
+            "perimetre": key[0],
+            "departements": list(key[1]),
+            "communes": list(key[2]),
+            "typologies": list(key[3]),
+            "nb": count,
+        }
+        for key, count in QUERY_LOG.top_queries(n)
+    ]
+    return jsonify({"top": top, "cache": FILTER_CACHE.stats()})
+
+
+@app.route("/api/communes/search")
+def api_communes_search():
+    """API: Autocomplétion des communes (préfixe de nom ou de code INSEE), par population"""
+    perimetre = request.args.get("perimetre", "scot")
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int)
+    
+    index = get_perimetre_search_index(perimetre)
+    
+    if index is None:
+        return jsonify({"error": "Données non disponibles"}), 500
+    
+    return jsonify(index.search(q, limit))
 
 
 @app.route("/api/communes-coords")
@@ -757,6 +1272,9 @@ def api_communes_coords():
     if not codes_insee:
         return jsonify({"error": "Codes INSEE requis"}), 400
     
+    # Import différé : requests n'est chargé que si le géocodage est utilisé
+    import requests
+    
     coords_data = []
     for code in codes_insee:
         try:
@@ -779,6 +1297,48 @@ def api_communes_coords():
     return jsonify(coords_data)
 
 
+@app.route("/api/chart/<panel>.svg")
+def api_chart_svg(panel):
+    """API: Panneau pré-rendu en SVG (trajectory, evolution, repartition, radar) avec filtres"""
+    if panel not in RENDERERS:
+        return jsonify({"error": "Graphique inconnu"}), 404
+    
+    perimetre = request.args.get("perimetre", "scot")
+    departements = request.args.getlist("departements")
+    communes = request.args.getlist("communes")
+    typologies = request.args.getlist("typologies")
+    
+    record_query(perimetre, departements, communes, typologies)
+    svg = render_panel(panel, perimetre, departements, communes, typologies)
+    
+    if svg is None:
+        return jsonify({"error": "Données non disponibles"}), 500
+    
+    response = make_response(svg)
+    response.mimetype = "image/svg+xml"
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route("/rapport")
+def rapport():
+    """Rapport statique imprimable (graphiques rendus côté serveur)"""
+    perimetre = request.args.get("perimetre", "scot")
+    departements = request.args.getlist("departements")
+    communes = request.args.getlist("communes")
+    typologies = request.args.getlist("typologies")
+    
+    record_query(perimetre, departements, communes, typologies)
+    html = render_report(perimetre, departements, communes, typologies)
+    
+    if html is None:
+        return jsonify({"error": "Données non disponibles"}), 500
+    
+    return html
+
+
 @app.route("/api/last-update")
 def api_last_update():
     """API: Date de dernière mise à jour"""
@@ -790,10 +1350,23 @@ def api_last_update():
         return jsonify({"last_update": datetime.now().strftime("%d/%m/%Y")})
 
 
+@app.before_request
+def ensure_data_loaded():
+    """Charge les données à la première requête si create_app() n'a pas été appelée"""
+    if not _INITIALIZED:
+        init_data()
+
+
 # ============================================
 # POINT D'ENTRÉE
 # ============================================
 
+def create_app():
+    """Fabrique de l'application : charge les données puis retourne l'application Flask"""
+    init_data()
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    create_app().run(debug=True, host="0.0.0.0", port=5000)
 
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures communes : fichier national synthétique
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_national_csv(path, nb_communes=200, seed=0):
+    """
+    Écrit un CSV national synthétique au format de l'Observatoire
+
+    Quelques départements, plusieurs EPCI par département, des SCoT dont un
+    sur cinq est manquant (communes hors SCoT).
+
+    Returns:
+        DataFrame écrit (texte, tel que lu par le CSV)
+    """
+    rng = np.random.default_rng(seed)
+    deps = rng.choice(["07", "26", "38", "2A"], nb_communes)
+    epci = [f"2000{d}{k}" for d, k in zip(deps, rng.integers(0, 3, nb_communes))]
+    scot = [f"SCoT {d}-{k}" for d, k in zip(deps, rng.integers(0, 2, nb_communes))]
+    hors_scot = rng.random(nb_communes) < 0.2
+
+    df = pd.DataFrame({
+        "idcom": [f"{d}{i:03d}" for i, d in enumerate(deps)],
+        "idcomtxt": [f"Commune {i}" for i in range(nb_communes)],
+        "idreg": "84",
+        "idregtxt": "Auvergne-Rhône-Alpes",
+        "iddep": deps,
+        "iddeptxt": [f"Département {d}" for d in deps],
+        "epci24": epci,
+        "epci24txt": [f"CC {e}" for e in epci],
+        "scot": np.where(hors_scot, "", scot),
+        "aav2020_typo": rng.choice(["11", "12", "20", "30"], nb_communes),
+        "naf09art24": rng.integers(0, 500_000, nb_communes),
+        "pop21": rng.integers(50, 20_000, nb_communes),
+        "pop1521": rng.integers(-200, 500, nb_communes),
+    })
+    df.to_csv(path, sep=";", index=False)
+    return df.astype({"scot": str}).replace({"scot": {"": None}})
+
+
+@pytest.fixture
+def national_csv(tmp_path):
+    """Chemin d'un CSV national synthétique et DataFrame de référence"""
+    path = tmp_path / "national.csv"
+    return path, make_national_csv(path)
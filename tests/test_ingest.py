@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de l'ingestion par périmètre (utils.ingest)
+"""
+
+import json
+
+import pytest
+
+from utils.ingest import MANIFEST_NAME, NIVEAUX, ingest, load_manifest
+
+
+def _ingest(source, output_dir):
+    # Petits chunks : les partitions reçoivent des lignes de plusieurs chunks
+    return ingest(source, output_dir, chunksize=17, log=lambda *_: None)
+
+
+def test_partitions_par_niveau(national_csv, tmp_path):
+    source, reference = national_csv
+    output_dir = tmp_path / "perimetres"
+    manifest = _ingest(source, output_dir)
+
+    for niveau, (col_code, _) in NIVEAUX.items():
+        attendus = reference.dropna(subset=[col_code]).groupby(col_code)
+        entries = {e["code"]: e for e in manifest["perimetres"] if e["niveau"] == niveau}
+        assert set(entries) == set(attendus.groups)
+        for code, groupe in attendus:
+            entry = entries[code]
+            assert entry["nb_communes"] == len(groupe)
+            assert entry["population"] == int(groupe["pop21"].sum())
+
+
+def test_communes_hors_scot_exclues(national_csv, tmp_path):
+    source, reference = national_csv
+    output_dir = tmp_path / "perimetres"
+    manifest = _ingest(source, output_dir)
+
+    hors_scot = set(reference.loc[reference["scot"].isna(), "idcom"])
+    assert hors_scot
+    ecrites = set()
+    for entry in manifest["perimetres"]:
+        if entry["niveau"] != "scot":
+            continue
+        lignes = (output_dir / entry["fichier"]).read_text(encoding="utf-8").splitlines()[1:]
+        ecrites.update(ligne.split(";")[0] for ligne in lignes)
+    assert ecrites == set(reference.loc[reference["scot"].notna(), "idcom"])
+    assert not ecrites & hors_scot
+
+
+def test_fichiers_et_manifeste(national_csv, tmp_path):
+    source, _ = national_csv
+    output_dir = tmp_path / "perimetres"
+    manifest = _ingest(source, output_dir)
+
+    assert manifest["nb_lignes"] == 200
+    assert load_manifest(output_dir) == json.loads((output_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    for entry in manifest["perimetres"]:
+        assert {"id", "niveau", "code", "label", "fichier", "nb_communes", "population"} <= entry.keys()
+        lignes = (output_dir / entry["fichier"]).read_text(encoding="utf-8").splitlines()
+        # Un seul en-tête par fichier, puis une ligne par commune
+        assert lignes[0].startswith("idcom;")
+        assert sum(ligne == lignes[0] for ligne in lignes) == 1
+        assert len(lignes) - 1 == entry["nb_communes"]
+
+
+def test_reingestion_remplace_la_sortie(national_csv, tmp_path):
+    source, _ = national_csv
+    output_dir = tmp_path / "perimetres"
+    _ingest(source, output_dir)
+    (output_dir / "obsolete.csv").write_text("x", encoding="utf-8")
+
+    _ingest(source, output_dir)
+    assert not (output_dir / "obsolete.csv").exists()
+
+
+def test_refus_repertoire_non_ingere(national_csv, tmp_path):
+    source, _ = national_csv
+    output_dir = tmp_path / "data"
+    output_dir.mkdir()
+    (output_dir / "data_scot.csv").write_text("a;b\n", encoding="utf-8")
+
+    with pytest.raises(FileExistsError):
+        _ingest(source, output_dir)
+    assert (output_dir / "data_scot.csv").read_text(encoding="utf-8") == "a;b\n"
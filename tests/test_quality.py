@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la détection d'unité des flux totaux (utils.quality)
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.quality import analyse_units, detect_units
+
+
+def _communes(nb=4):
+    """Communes cohérentes en m² : une destination (ferré) très peu représentée"""
+    rng = np.random.default_rng(1)
+    hab = rng.integers(20_000, 80_000, nb)
+    act = rng.integers(10_000, 40_000, nb)
+    rou = rng.integers(1_000, 5_000, nb)
+    fer = np.array([3] + [0] * (nb - 1))
+    df = pd.DataFrame({
+        "art09act24": act, "art09hab24": hab, "art09mix24": np.zeros(nb, int),
+        "art09rou24": rou, "art09fer24": fer, "art09inc24": np.zeros(nb, int),
+    }).astype("int32")
+    df["naf09art24"] = df.sum(axis=1).astype("int32")
+    df["artif_total_ha"] = df["naf09art24"] / 10000
+    return df
+
+
+def test_petite_destination_reste_dans_l_unite_du_total():
+    unites, avertissements = analyse_units(_communes())
+    assert set(unites.values()) == {"m2"}
+    assert avertissements == []
+
+
+def test_destination_en_hectares():
+    df = _communes()
+    df["art09hab24"] = (df["art09hab24"] / 10000).round().astype("int32")
+    assert detect_units(df)["art09hab24"] == "ha"
+    assert detect_units(df)["art09act24"] == "m2"
+
+
+def test_incoherence_inexpliquee_donne_un_avertissement():
+    df = _communes()
+    df["naf09art24"] = (df["naf09art24"] * 2).astype("int32")
+    df["artif_total_ha"] = df["naf09art24"] / 10000
+    unites, avertissements = analyse_units(df)
+    assert unites["art09fer24"] == "m2"
+    assert any(a.startswith("art09fer24") for a in avertissements)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Tests du journal des requêtes (utils.query_log)
+"""
+
+import threading
+
+from utils.query_log import QueryLog
+
+
+KEY_A = ("scot", ("Ardèche",), (), ())
+KEY_B = ("ccpda", (), (), ("11",))
+
+
+def test_top_queries_relit_le_fichier_une_seule_fois(tmp_path, monkeypatch):
+    path = tmp_path / "queries.jsonl"
+    ancien = QueryLog(path)
+    for key in (KEY_A, KEY_A, KEY_B):
+        ancien.record(key)
+    ancien.flush()
+
+    log = QueryLog(path)
+    lectures = []
+    lire = log._read_file_keys
+    monkeypatch.setattr(log, "_read_file_keys", lambda: lectures.append(1) or lire())
+
+    assert log.top_queries() == [(KEY_A, 2), (KEY_B, 1)]
+    log.record(KEY_B)
+    log.record(KEY_B)
+    assert log.top_queries(1) == [(KEY_B, 3)]
+    log.flush()
+    assert log.top_queries() == [(KEY_B, 3), (KEY_A, 2)]
+    assert len(lectures) == 1
+
+
+def test_archivage_sous_verrou_inter_processus(tmp_path):
+    """Un autre worker qui tient le verrou bloque l'archivage et l'écriture"""
+    path = tmp_path / "queries.jsonl"
+    path.write_text("x" * 100 + "\n", encoding="utf-8")
+    log = QueryLog(path, max_bytes=50)
+    autre_worker = QueryLog(path)
+    log.record(KEY_A)
+
+    with autre_worker._file_lock():
+        flush = threading.Thread(target=log.flush)
+        flush.start()
+        flush.join(0.2)
+        assert flush.is_alive()
+        assert not path.with_suffix(".jsonl.1").exists()
+    flush.join()
+
+    assert path.with_suffix(".jsonl.1").read_text(encoding="utf-8") == "x" * 100 + "\n"
+    assert log.top_queries() == [(KEY_A, 1)]
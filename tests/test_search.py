@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de l'index de recherche des communes (utils.search)
+"""
+
+import pandas as pd
+import pytest
+
+from utils.search import MAX_RESULTATS, CommuneIndex
+
+
+@pytest.fixture
+def index():
+    df = pd.DataFrame({
+        "idcom": ["07010", "07011", "42201", "26001"],
+        "idcomtxt": ["Annonay", "Andance", "Saint-Appolinard", "Saint-Étienne-de-Valoux"],
+        "iddeptxt": ["Ardèche", "Ardèche", "Loire", "Drôme"],
+        "pop21": [16873, 1200, 699, 300],
+    })
+    return CommuneIndex(df)
+
+
+def test_prefixe_sans_accents_classe_par_population(index):
+    assert [r["commune"] for r in index.search("an")] == ["Annonay", "Andance"]
+    assert [r["commune"] for r in index.search("etienne")] == ["Saint-Étienne-de-Valoux"]
+    assert [r["code_insee"] for r in index.search("07")] == ["07010", "07011"]
+
+
+@pytest.mark.parametrize("limit", [0, -1, -MAX_RESULTATS])
+def test_limite_nulle_ou_negative(index, limit):
+    assert index.search("an", limit) == []
+
+
+@pytest.mark.parametrize("requete", ["", "  ", "'", "-", " - "])
+def test_requete_vide_ou_separateurs(index, requete):
+    assert index.search(requete) == []
+
+
+def test_limite_bornee(index):
+    assert len(index.search("saint", 1)) == 1
+    assert len(index.search("saint", MAX_RESULTATS + 10)) == 2
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Arbre d'agrégation hiérarchique : région → département → EPCI → SCoT → commune
+
+Chaque nœud stocke le vecteur des sommes des mesures de ses communes. L'arbre est
+construit une seule fois au chargement ; descendre d'un niveau coûte O(enfants)
+au lieu d'un nouveau filtrage de la table de base.
+"""
+
+import numpy as np
+
+from utils.schema import COLS_MESURES
+
+
+# Niveaux de l'arbre : (nom, colonne de code, colonne de libellé)
+NIVEAUX = [
+    ("region", "idreg", "idregtxt"),
+    ("departement", "iddep", "iddeptxt"),
+    ("epci", "epci24", "epci24txt"),
+    ("scot", "scot", "scot"),
+    ("commune", "idcom", "idcomtxt"),
+]
+
+LABEL_MANQUANT = {
+    "region": "Région inconnue",
+    "departement": "Département inconnu",
+    "epci": "Hors EPCI",
+    "scot": "Hors SCoT",
+    "commune": "Commune inconnue",
+}
+
+
+class HierarchyNode:
+    """Nœud de l'arbre : identifiant, niveau, libellé, sommes des mesures et enfants"""
+
+    __slots__ = ("id", "niveau", "code", "label", "sums", "nb_communes", "parent", "children")
+
+    def __init__(self, node_id, niveau, code, label, sums, nb_communes, parent=None):
+        self.id = node_id
+        self.niveau = niveau
+        self.code = code
+        self.label = label
+        self.sums = sums
+        self.nb_communes = nb_communes
+        self.parent = parent
+        self.children = []
+
+    def totaux(self, columns):
+        """
+        Sommes des mesures du nœud
+
+        Returns:
+            Dictionnaire colonne -> somme (entiers Python)
+        """
+        return dict(zip(columns, self.sums.tolist()))
+
+    def chemin(self):
+        """Liste des nœuds de la racine jusqu'à ce nœud"""
+        noeuds = []
+        node = self
+        while node is not None:
+            noeuds.append(node)
+            node = node.parent
+        return noeuds[::-1]
+
+
+class Hierarchy:
+    """Arbre d'agrégation d'un périmètre, indexé par identifiant de nœud"""
+
+    def __init__(self, root, nodes, columns):
+        self.root = root
+        self.nodes = nodes
+        self.columns = columns
+
+    def get(self, node_id):
+        """Retourne le nœud d'identifiant donné, ou None"""
+        if 0 <= node_id < len(self.nodes):
+            return self.nodes[node_id]
+        return None
+
+
+def _codes_niveau(df, code_col, label_col, niveau):
+    """Codes et libellés d'un niveau, valeurs manquantes comprises"""
+    if code_col not in df.columns:
+        n = len(df)
+        return np.full(n, None, dtype=object), np.full(n, LABEL_MANQUANT[niveau], dtype=object)
+
+    codes = np.array(df[code_col].astype(object), dtype=object)
+    source_labels = df[label_col] if label_col in df.columns else df[code_col]
+    labels = np.array(source_labels.astype(object), dtype=object)
+    manquants = codes != codes  # NaN
+    codes[manquants] = None
+    labels[manquants | (labels != labels)] = LABEL_MANQUANT[niveau]
+    return codes, labels
+
+
+def build_hierarchy(df, label_racine="Périmètre"):
+    """
+    Construit l'arbre d'agrégation d'un DataFrame de communes
+
+    Les communes sont triées par chemin complet, si bien que chaque nœud couvre
+    une plage contiguë de lignes : les sommes d'un niveau sont calculées en un
+    appel np.add.reduceat par nœud parent.
+
+    Args:
+        df: DataFrame typé selon le schéma
+        label_racine: Libellé du nœud racine
+
+    Returns:
+        Hierarchy
+    """
+    columns = [c for c in COLS_MESURES if c in df.columns]
+    mesures = df[columns].to_numpy(dtype=np.int64)
+
+    niveaux = [_codes_niveau(df, code_col, label_col, nom) for nom, code_col, label_col in NIVEAUX]
+
+    # Tri des communes par chemin complet (None trié en dernier) : chaque nœud
+    # correspond alors à une plage contiguë de lignes
+    cles = [
+        [(c is None, "" if c is None else str(c)) for c in codes]
+        for codes, _ in niveaux
+    ]
+    ordre = sorted(range(len(df)), key=lambda i: tuple(cle[i] for cle in cles))
+    ordre = np.asarray(ordre, dtype=np.int64)
+    mesures = mesures[ordre]
+
+    root = HierarchyNode(0, "racine", None, label_racine, mesures.sum(axis=0), len(df))
+    nodes = [root]
+
+    # Plages [debut, fin) de chaque nœud du niveau courant
+    plages = [(0, len(df), root)]
+    for profondeur, (nom, _, _) in enumerate(NIVEAUX):
+        codes, labels = niveaux[profondeur]
+        codes_tries = [cles[profondeur][i] for i in ordre]
+        nouvelles_plages = []
+        for debut, fin, parent in plages:
+            if debut == fin:
+                continue
+            # Bornes des sous-groupes à l'intérieur de la plage du parent
+            bornes = [debut] + [
+                i for i in range(debut + 1, fin) if codes_tries[i] != codes_tries[i - 1]
+            ] + [fin]
+            sommes = np.add.reduceat(mesures[debut:fin], [b - debut for b in bornes[:-1]], axis=0)
+            for k, (d, f) in enumerate(zip(bornes[:-1], bornes[1:])):
+                ligne = ordre[d]
+                node = HierarchyNode(
+                    len(nodes), nom, codes[ligne], str(labels[ligne]), sommes[k], f - d, parent
+                )
+                parent.children.append(node)
+                nodes.append(node)
+                nouvelles_plages.append((d, f, node))
+        plages = nouvelles_plages
+
+    return Hierarchy(root, nodes, columns)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestion en flux du fichier national de consommation d'espaces NAF
+
+Découpe le fichier national en instantanés préparés par périmètre (SCoT, EPCI,
+département) et écrit un manifeste que l'application sait découvrir.
+
+Usage :
+    python -m utils.ingest chemin/vers/fichier_national.csv [--output data/perimetres]
+"""
+
+import argparse
+import json
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from utils.schema import SchemaError, apply_schema, read_csv_kwargs, validate_schema
+
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.parent / "data" / "perimetres"
+MANIFEST_NAME = "manifest.json"
+DEFAULT_CHUNKSIZE = 25_000
+
+# Niveau de périmètre -> (colonne de partition, colonne de libellé)
+NIVEAUX = {
+    "scot": ("scot", "scot"),
+    "epci": ("epci24", "epci24txt"),
+    "dep": ("iddep", "iddeptxt"),
+}
+
+
+def slugify(texte: str) -> str:
+    """
+    Transforme un code ou un libellé en nom de fichier sûr
+
+    Returns:
+        Chaîne en minuscules, sans accents, mots séparés par des _
+    """
+    texte = unicodedata.normalize("NFKD", str(texte)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texte.lower()).strip("_") or "inconnu"
+
+
+class _Partitions:
+    """Suivi des fichiers de partition écrits au fil des chunks"""
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.entries = {}
+        self._fichiers = set()
+
+    def _entry(self, niveau, code, label):
+        key = (niveau, code)
+        if key not in self.entries:
+            base = f"{niveau}_{slugify(code)}"
+            nom, i = base, 1
+            while nom in self._fichiers:
+                i += 1
+                nom = f"{base}_{i}"
+            self._fichiers.add(nom)
+            self.entries[key] = {
+                "id": nom,
+                "niveau": niveau,
+                "code": code,
+                "label": label,
+                "fichier": f"{nom}.csv",
+                "nb_communes": 0,
+                "population": 0,
+            }
+        return self.entries[key]
+
+    def append(self, niveau, code, label, lignes, population, header):
+        """Ajoute des lignes CSV déjà sérialisées à l'instantané du périmètre"""
+        entry = self._entry(niveau, code, label)
+        with open(self.output_dir / entry["fichier"], "a", encoding="utf-8") as f:
+            if entry["nb_communes"] == 0:
+                f.write(header)
+            f.writelines(lignes)
+        entry["nb_communes"] += len(lignes)
+        entry["population"] += population
+
+
+def ingest(source, output_dir=DEFAULT_OUTPUT_DIR, chunksize=DEFAULT_CHUNKSIZE, log=print):
+    """
+    Lit le fichier national par chunks et écrit un instantané par périmètre
+
+    La mémoire utilisée est bornée par la taille d'un chunk : aucune partition
+    n'est conservée en mémoire, les lignes sont ajoutées aux fichiers au fil de l'eau.
+    Le répertoire de sortie n'est remplacé qu'une fois l'ingestion terminée.
+
+    Args:
+        source: Chemin du CSV national de l'Observatoire
+        output_dir: Répertoire des instantanés et du manifeste
+        chunksize: Nombre de lignes lues par chunk
+        log: Fonction d'affichage de la progression
+
+    Returns:
+        Manifeste écrit (dictionnaire)
+
+    Raises:
+        SchemaError: si un chunk ne respecte pas le schéma
+        FileExistsError: si output_dir n'est pas vide et ne vient pas d'une ingestion
+    """
+    import pandas as pd
+
+    source = Path(source)
+    output_dir = Path(output_dir)
+    _check_output_dir(output_dir)
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".ingest_", dir=output_dir.parent))
+
+    partitions = _Partitions(tmp_dir)
+    nb_lignes = 0
+    debut = time.perf_counter()
+
+    try:
+        reader = pd.read_csv(source, chunksize=chunksize, **read_csv_kwargs())
+        for num_chunk, chunk in enumerate(reader, start=1):
+            validate_schema(chunk, source=f"{source.name} (chunk {num_chunk})")
+            chunk = apply_schema(chunk)
+
+            # Sérialisation unique du chunk, puis répartition des lignes par périmètre
+            texte = chunk.to_csv(sep=";", index=False, lineterminator="\n")
+            header, *lignes = texte.splitlines(keepends=True)
+            population = chunk["pop21"].to_numpy() if "pop21" in chunk.columns else np.zeros(len(chunk))
+
+            for niveau, (col_code, col_label) in NIVEAUX.items():
+                if col_code not in chunk.columns:
+                    continue
+                codes = chunk[col_code].cat.codes.to_numpy()
+                ordre = np.argsort(codes, kind="stable")
+                bornes = np.flatnonzero(np.diff(codes[ordre])) + 1
+                for indices in np.split(ordre, bornes):
+                    if len(indices) == 0 or codes[indices[0]] < 0:
+                        continue
+                    premier = indices[0]
+                    code = chunk[col_code].iloc[premier]
+                    label = chunk[col_label].iloc[premier] if col_label in chunk.columns else code
+                    partitions.append(
+                        niveau, str(code), str(label),
+                        [lignes[i] for i in indices],
+                        int(population[indices].sum()),
+                        header,
+                    )
+
+            nb_lignes += len(chunk)
+            duree = time.perf_counter() - debut
+            log(f"  chunk {num_chunk} : {nb_lignes} lignes ({nb_lignes / duree:,.0f} lignes/s)")
+
+        duree = time.perf_counter() - debut
+        manifest = {
+            "source": source.name,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "nb_lignes": nb_lignes,
+            "duree_s": round(duree, 3),
+            "lignes_par_s": round(nb_lignes / duree) if duree > 0 else None,
+            "perimetres": sorted(
+                partitions.entries.values(), key=lambda e: (e["niveau"], e["label"])
+            ),
+        }
+        with open(tmp_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        if output_dir.exists():
+            _check_output_dir(output_dir)
+            shutil.rmtree(output_dir)
+        tmp_dir.rename(output_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    log(
+        f"{nb_lignes} lignes ingérées en {duree:.2f} s "
+        f"({manifest['lignes_par_s'] or 0:,} lignes/s), "
+        f"{len(manifest['perimetres'])} périmètres écrits dans {output_dir}"
+    )
+    return manifest
+
+
+def _check_output_dir(output_dir):
+    """
+    Vérifie que le répertoire de sortie peut être remplacé : absent, vide, ou
+    issu d'une ingestion précédente (contient un manifeste)
+
+    Raises:
+        FileExistsError: si le remplacer effacerait des fichiers qui ne viennent pas de l'ingestion
+    """
+    if not output_dir.exists():
+        return
+    if not output_dir.is_dir():
+        raise FileExistsError(f"{output_dir} existe et n'est pas un répertoire")
+    if any(output_dir.iterdir()) and not (output_dir / MANIFEST_NAME).exists():
+        raise FileExistsError(
+            f"{output_dir} n'est pas vide et ne contient pas de {MANIFEST_NAME} : "
+            "refus de le remplacer (choisir un répertoire dédié avec --output)"
+        )
+
+
+def load_manifest(output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Lit le manifeste des périmètres ingérés
+
+    Returns:
+        Manifeste (dictionnaire), ou None si aucune ingestion n'a été faite
+    """
+    path = Path(output_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion du fichier national NAF par périmètre")
+    parser.add_argument("source", help="CSV national de l'Observatoire (séparateur ;)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT_DIR), help="Répertoire de sortie")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Lignes par chunk")
+    args = parser.parse_args(argv)
+
+    try:
+        ingest(args.source, args.output, args.chunksize)
+    except (SchemaError, FileExistsError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
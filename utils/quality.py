@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Contrôle qualité des flux annuels NAF
+
+Passe vectorisée sur la matrice communes x années, exécutée au chargement :
+- valeurs aberrantes par z-score robuste (médiane / MAD de chaque commune)
+- cohérence des destinations (act + hab + mix + rou + fer + inc = naf) et des totaux 2009-2024
+- détection de l'unité des colonnes de flux (m² ou hectares)
+"""
+
+import time
+
+import numpy as np
+
+from utils.schema import ANNEES_FLUX, COLS_NAF_ANNUELLES, COLS_TOTAUX, DESTINATIONS
+
+
+# Seuil du z-score robuste au-delà duquel une année est signalée. Plus strict que le
+# 3,5 usuel : les flux communaux sont naturellement irréguliers (une opération = un pic)
+SEUIL_ZSCORE = 5
+# Flux minimal signalé (m²) : les petites valeurs isolées ne sont pas des anomalies utiles
+FLUX_MIN_ANOMALIE = 20000
+# Écart toléré entre la somme des destinations et le flux NAF : 1 m² ou 0,1 %
+TOLERANCE_ABSOLUE = 1
+TOLERANCE_RELATIVE = 0.001
+# Détection d'unité : écart relatif toléré entre la somme des destinations et
+# naf09art24 (sur le périmètre), et part du flux total en deçà de laquelle une
+# destination est examinée. Les flux sont des entiers (int32) : une colonne en
+# hectares a perdu ses décimales, d'où une tolérance large
+TOLERANCE_UNITES = 0.05
+SEUIL_PART_UNITE = 1e-3
+# Nombre maximal d'éléments détaillés par catégorie dans le rapport
+MAX_DETAILS = 100
+
+COLS_DESTINATIONS_TOTAUX = COLS_TOTAUX[1:]
+
+
+def robust_zscores(matrice):
+    """
+    Z-scores robustes ligne par ligne : 0.6745 * (x - médiane) / MAD
+
+    Quand la MAD est nulle (années majoritairement identiques), l'écart absolu
+    moyen est utilisé ; si lui aussi est nul, toute valeur différente de la
+    médiane reçoit un score infini.
+
+    Args:
+        matrice: Tableau (communes x années)
+
+    Returns:
+        Tableau de même forme (float64)
+    """
+    matrice = np.asarray(matrice, dtype=np.float64)
+    mediane = np.median(matrice, axis=1, keepdims=True)
+    ecarts = np.abs(matrice - mediane)
+    mad = np.median(ecarts, axis=1, keepdims=True)
+    # 1.2533 = sqrt(pi / 2) : rend l'écart absolu moyen comparable à la MAD normalisée
+    echelle = np.where(mad > 0, mad / 0.6745, ecarts.mean(axis=1, keepdims=True) * 1.2533)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (matrice - mediane) / echelle
+    return np.where(ecarts == 0, 0.0, z)
+
+
+def _ecarts_hors_tolerance(somme, reference):
+    """Masque des écarts dépassant la tolérance absolue et relative"""
+    ecart = np.abs(somme - reference)
+    return ecart > np.maximum(TOLERANCE_ABSOLUE, TOLERANCE_RELATIVE * np.abs(reference))
+
+
+def analyse_units(df):
+    """
+    Détecte l'unité (m² ou hectares) des colonnes de flux totaux
+
+    naf09art24 est comparée à artif_total_ha (hectares). Les destinations
+    art09xxx24 sont par défaut dans l'unité de naf09art24 : une destination peu
+    représentée a légitimement une part très faible du flux total. Une colonne
+    n'est déclarée dans l'autre unité que si sa part est compatible avec un
+    facteur 10000 et que la somme des destinations, incohérente avec
+    naf09art24, le redevient une fois cette colonne convertie. Une part faible
+    sur un fichier incohérent que la conversion n'explique pas donne un
+    avertissement, sans changement d'unité.
+
+    Args:
+        df: DataFrame typé selon le schéma
+
+    Returns:
+        (dictionnaire colonne -> "m2" | "ha", liste d'avertissements)
+    """
+    unites = {}
+    avertissements = []
+
+    def somme(col):
+        return float(df[col].to_numpy(dtype=np.float64).sum()) if col in df.columns else 0.0
+
+    total = somme("naf09art24")
+    ref_ha = somme("artif_total_ha")
+    if total > 0 and ref_ha > 0:
+        # En m², naf09art24 vaut 10000 fois artif_total_ha ; en hectares, environ 1 fois
+        unites["naf09art24"] = "m2" if total / ref_ha > 100 else "ha"
+    else:
+        unites["naf09art24"] = "m2"
+    autre_unite = "ha" if unites["naf09art24"] == "m2" else "m2"
+    # Facteur appliqué à une destination exprimée dans l'autre unité que naf09art24
+    facteur = 1e-4 if unites["naf09art24"] == "m2" else 1e4
+
+    cols = [col for col in COLS_DESTINATIONS_TOTAUX if col in df.columns]
+    sommes = {col: somme(col) for col in cols}
+    somme_destinations = sum(sommes.values())
+
+    def coherent(valeur):
+        return abs(valeur - total) <= TOLERANCE_UNITES * total
+
+    for col in cols:
+        unites[col] = unites["naf09art24"]
+        valeur = sommes[col]
+        if total <= 0 or valeur <= 0 or coherent(somme_destinations):
+            continue
+        part = valeur / total
+        if part > SEUIL_PART_UNITE:
+            continue
+        convertie = somme_destinations - valeur + valeur / facteur
+        if part <= facteur * (1 + TOLERANCE_UNITES) and coherent(convertie):
+            unites[col] = autre_unite
+        else:
+            avertissements.append(
+                f"{col} : part de {part:.2e} du flux total et somme des destinations "
+                f"incohérente avec naf09art24 (unité conservée : {unites[col]})"
+            )
+
+    return unites, avertissements
+
+
+def detect_units(df):
+    """
+    Unités des colonnes de flux totaux (voir analyse_units)
+
+    Returns:
+        Dictionnaire colonne -> "m2" | "ha"
+    """
+    return analyse_units(df)[0]
+
+
+def run_quality_checks(df):
+    """
+    Exécute tous les contrôles qualité sur un DataFrame de communes
+
+    Args:
+        df: DataFrame typé selon le schéma
+
+    Returns:
+        Rapport (dictionnaire sérialisable en JSON)
+    """
+    debut = time.perf_counter()
+    communes = df["idcomtxt"].astype(str).to_numpy() if "idcomtxt" in df.columns else np.arange(len(df)).astype(str)
+    codes = df["idcom"].astype(str).to_numpy() if "idcom" in df.columns else communes
+    cols_naf = [c for c in COLS_NAF_ANNUELLES if c in df.columns]
+    annees = np.array([2000 + int(c[-2:]) for c in cols_naf])
+    naf = df[cols_naf].to_numpy(dtype=np.int64)
+
+    # 1. Valeurs aberrantes : z-score robuste de chaque année dans l'historique de la commune
+    z = robust_zscores(naf)
+    aberrant = (z > SEUIL_ZSCORE) & (naf >= FLUX_MIN_ANOMALIE)
+    lignes, colonnes = np.nonzero(aberrant)
+    ordre = np.argsort(-np.minimum(z[lignes, colonnes], 1e9), kind="stable")[:MAX_DETAILS]
+    anomalies = [
+        {
+            "code_insee": codes[i],
+            "commune": communes[i],
+            "annee": int(annees[j]),
+            "valeur_ha": round(naf[i, j] / 10000, 2),
+            "mediane_ha": round(float(np.median(naf[i])) / 10000, 2),
+            "zscore": round(float(z[i, j]), 1) if np.isfinite(z[i, j]) else None,
+        }
+        for i, j in zip(lignes[ordre], colonnes[ordre])
+    ]
+
+    # 2. Cohérence annuelle : somme des destinations = flux NAF
+    incoherences = []
+    nb_incoherences = 0
+    for a in ANNEES_FLUX:
+        col_naf = f"naf{a:02d}art{a + 1:02d}"
+        cols_dest = [f"art{a:02d}{dest}{a + 1:02d}" for dest in DESTINATIONS]
+        if col_naf not in df.columns or not all(c in df.columns for c in cols_dest):
+            continue
+        reference = df[col_naf].to_numpy(dtype=np.int64)
+        somme = df[cols_dest].to_numpy(dtype=np.int64).sum(axis=1)
+        hors = np.flatnonzero(_ecarts_hors_tolerance(somme, reference))
+        nb_incoherences += len(hors)
+        for i in hors[: max(0, MAX_DETAILS - len(incoherences))]:
+            incoherences.append({
+                "code_insee": codes[i],
+                "commune": communes[i],
+                "periode": f"{2000 + a}-{2001 + a}",
+                "naf_ha": round(reference[i] / 10000, 2),
+                "somme_destinations_ha": round(somme[i] / 10000, 2),
+                "ecart_ha": round((somme[i] - reference[i]) / 10000, 2),
+            })
+
+    # 3. Cohérence des totaux 2009-2024 : somme des années et somme des destinations
+    totaux = []
+    if "naf09art24" in df.columns:
+        total = df["naf09art24"].to_numpy(dtype=np.int64)
+        controles = [("somme_annuelle", naf.sum(axis=1))]
+        if all(c in df.columns for c in COLS_DESTINATIONS_TOTAUX):
+            controles.append(
+                ("somme_destinations", df[COLS_DESTINATIONS_TOTAUX].to_numpy(dtype=np.int64).sum(axis=1))
+            )
+        for nom, somme in controles:
+            hors = np.flatnonzero(_ecarts_hors_tolerance(somme, total))
+            totaux.append({
+                "controle": nom,
+                "nb_communes": int(len(hors)),
+                "communes": [communes[i] for i in hors[:MAX_DETAILS]],
+            })
+
+    unites, avertissements_unites = analyse_units(df)
+
+    return {
+        "nb_communes": len(df),
+        "nb_anomalies": int(aberrant.sum()),
+        "anomalies": anomalies,
+        "nb_incoherences": nb_incoherences,
+        "incoherences": incoherences,
+        "totaux": totaux,
+        "unites": unites,
+        "avertissements_unites": avertissements_unites,
+        "seuil_zscore": SEUIL_ZSCORE,
+        "duree_ms": round((time.perf_counter() - debut) * 1000, 1),
+    }
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Journal des requêtes de filtres et cache à admission par fréquence (TinyLFU)
+
+- QueryLog : tampon circulaire en mémoire, vidé en arrière-plan dans un fichier JSONL.
+  L'enregistrement sur le chemin de la requête se limite à un append sur un deque.
+  Le fichier peut être partagé par plusieurs processus (workers gunicorn) : écriture
+  et archivage se font sous verrou fcntl.
+- FrequencySketch : Count-Min sketch à vieillissement (compteurs divisés par deux
+  périodiquement), estimation de la popularité récente d'une clé.
+- TinyLFUCache : cache LRU dont l'admission compare la fréquence du candidat à celle
+  de la victime ; les entrées épinglées (requêtes historiquement populaires) ne sont
+  jamais évincées.
+"""
+
+import atexit
+import json
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+
+# ============================================
+# JOURNAL DES REQUÊTES
+# ============================================
+
+class QueryLog:
+    """Journal append-only des combinaisons de filtres demandées"""
+
+    def __init__(self, path=None, capacity=10000, flush_interval=5.0, max_bytes=5_000_000):
+        """
+        Args:
+            path: Fichier JSONL de destination (None : journal uniquement en mémoire)
+            capacity: Taille du tampon circulaire (les plus anciennes entrées non
+                vidées sont perdues si le flush ne suit pas)
+            flush_interval: Période du vidage en arrière-plan (secondes)
+            max_bytes: Taille au-delà de laquelle le fichier est archivé en .1
+        """
+        self.path = Path(path) if path else None
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._thread = None
+        # Compteur des requêtes vidées : historique relu une fois, puis mis à jour par flush()
+        self._counts = None
+
+    def record(self, key):
+        """Enregistre une requête (chemin critique : un append sur le deque)"""
+        self._buffer.append((time.time(), key))
+        if self._thread is None and self.path is not None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="query-log-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Erreur écriture journal des requêtes: {e}")
+
+    def flush(self):
+        """Écrit le contenu du tampon dans le fichier JSONL"""
+        if self.path is None:
+            return
+        with self._lock:
+            entries = []
+            while self._buffer:
+                try:
+                    entries.append(self._buffer.popleft())
+                except IndexError:
+                    break
+            if not entries:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._file_lock():
+                if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+                    self.path.replace(self._archive_path())
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for t, key in entries:
+                        f.write(json.dumps({"t": round(t, 3), "q": key}, ensure_ascii=False) + "\n")
+            if self._counts is not None:
+                self._counts.update(key for _, key in entries)
+
+    def _archive_path(self):
+        return self.path.with_suffix(self.path.suffix + ".1")
+
+    def _file_lock(self):
+        """Verrou exclusif inter-processus (fichier .lock) autour de l'écriture et de l'archivage"""
+        return _FileLock(self.path.with_suffix(self.path.suffix + ".lock"))
+
+    def _read_file_keys(self):
+        """Clés des requêtes écrites sur disque (archive puis fichier courant)"""
+        keys = []
+        for path in (self._archive_path(), self.path):
+            if not path.exists():
+                continue
+            with open(path, encoding="utf-8") as f:
+                for ligne in f:
+                    try:
+                        keys.append(_to_key(json.loads(ligne)["q"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        return keys
+
+    def top_queries(self, n=20):
+        """
+        Requêtes les plus fréquentes de l'historique
+
+        Le fichier n'est relu qu'au premier appel ; ensuite le compteur est tenu à
+        jour par flush() et seul le tampon non vidé est ajouté.
+
+        Returns:
+            Liste de (clé, nombre d'occurrences), par fréquence décroissante
+        """
+        with self._lock:
+            if self._counts is None:
+                self._counts = Counter()
+                if self.path is not None:
+                    self._counts.update(self._read_file_keys())
+            counts = self._counts.copy()
+            counts.update(key for _, key in list(self._buffer))
+        return counts.most_common(n)
+
+
+class _FileLock:
+    """Verrou fcntl.flock exclusif sur un fichier, sans effet si fcntl est indisponible"""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = open(self.path, "a")
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+            self._f.close()
+            self._f = None
+        return False
+
+
+def _to_key(valeur):
+    """Reconvertit une clé relue en JSON (listes) en tuple hachable"""
+    if isinstance(valeur, list):
+        return tuple(_to_key(v) for v in valeur)
+    return valeur
+
+
+# ============================================
+# ADMISSION PAR FRÉQUENCE (TinyLFU)
+# ============================================
+
+class FrequencySketch:
+    """Count-Min sketch à 4 lignes avec vieillissement périodique"""
+
+    _SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+
+    def __init__(self, width=1024, sample_size=None):
+        # Largeur en puissance de deux : l'index se calcule par masque
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self._mask = self.width - 1
+        self._rows = [[0] * self.width for _ in self._SEEDS]
+        self.sample_size = sample_size or 10 * self.width
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        return [((h * seed) >> 16) & self._mask for seed in self._SEEDS]
+
+    def increment(self, key):
+        for row, i in zip(self._rows, self._indexes(key)):
+            if row[i] < 15:
+                row[i] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+
+    def frequency(self, key):
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def _reset(self):
+        """Vieillissement : divise tous les compteurs par deux"""
+        for row in self._rows:
+            for i, val in enumerate(row):
+                row[i] = val >> 1
+        self._additions //= 2
+
+
+class TinyLFUCache:
+    """Cache LRU à admission TinyLFU avec entrées épinglées"""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.sketch = FrequencySketch(width=capacity * 16)
+        self._data = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        """
+        Retourne la valeur en cache, ou la calcule avec loader() et décide de l'admettre
+
+        Args:
+            key: Clé hachable
+            loader: Fonction sans argument produisant la valeur
+        """
+        with self._lock:
+            self.sketch.increment(key)
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        value = loader()
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def put(self, key, value, pin=False):
+        """Insère une valeur si elle gagne l'admission face à la victime LRU"""
+        with self._lock:
+            if pin:
+                self._pinned.add(key)
+            if key in self._data:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                return True
+            if len(self._data) >= self.capacity:
+                victim = next((k for k in self._data if k not in self._pinned), None)
+                if victim is None:
+                    return False
+                if not pin and self.sketch.frequency(key) <= self.sketch.frequency(victim):
+                    return False
+                del self._data[victim]
+            self._data[key] = value
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "taille": len(self._data),
+                "capacite": self.capacity,
+                "epinglees": len(self._pinned & self._data.keys()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Rendu serveur des graphiques du tableau de bord et génération de rapports statiques
+
+Les graphiques sont produits en SVG compact (sans dépendance de tracé), avec la
+même palette que static/js/charts.js. Le mode batch écrit un rapport HTML
+imprimable (prêt pour l'export PDF) par périmètre, en parallèle.
+
+Usage :
+    python -m utils.report [--output reports] [--workers 4] [--perimetres scot ccpda]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from pathlib import Path
+
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.parent / "reports"
+
+# Palette identique à static/js/charts.js
+COLORS = {
+    "blue": "#2E86AB",
+    "green": "#48BB78",
+    "orange": "#ED8936",
+    "purple": "#A23B72",
+    "red": "#F56565",
+    "gray": "#64748B",
+    "bgPrimary": "#0F172A",
+    "bgSecondary": "#1E293B",
+    "border": "#334155",
+    "textPrimary": "#FFFFFF",
+    "textSecondary": "#CBD5E0",
+    "textMuted": "#94A3B8",
+}
+
+WIDTH, HEIGHT = 640, 360
+MARGIN = {"t": 50, "r": 20, "b": 45, "l": 60}
+FONT = "font-family=\"Segoe UI,Roboto,sans-serif\""
+
+
+# ============================================
+# PRIMITIVES SVG
+# ============================================
+
+def _fmt(val):
+    """Nombre compact pour les attributs SVG"""
+    return f"{val:.1f}".rstrip("0").rstrip(".")
+
+
+def _svg(contenu, titre, width=WIDTH, height=HEIGHT):
+    """Enveloppe SVG avec fond et titre"""
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}" {FONT}>'
+        f'<rect width="{width}" height="{height}" fill="{COLORS["bgPrimary"]}"/>'
+        f'<text x="{width / 2}" y="26" fill="{COLORS["textPrimary"]}" font-size="15" '
+        f'font-weight="bold" text-anchor="middle">{escape(titre)}</text>'
+        f"{contenu}</svg>"
+    )
+
+
+def _nice_max(val):
+    """Borne supérieure arrondie de l'axe des ordonnées"""
+    if val <= 0:
+        return 1
+    puissance = 10 ** math.floor(math.log10(val))
+    for pas in (1, 2, 2.5, 5, 10):
+        if val <= pas * puissance:
+            return pas * puissance
+    return 10 * puissance
+
+
+def _axes(y_max, y_label, nb_graduations=5):
+    """Grille horizontale, graduations et titre de l'axe des ordonnées"""
+    x0, x1 = MARGIN["l"], WIDTH - MARGIN["r"]
+    y0, y1 = HEIGHT - MARGIN["b"], MARGIN["t"]
+    parts = []
+    for i in range(nb_graduations + 1):
+        val = y_max * i / nb_graduations
+        y = y0 - (y0 - y1) * i / nb_graduations
+        parts.append(
+            f'<line x1="{x0}" y1="{_fmt(y)}" x2="{x1}" y2="{_fmt(y)}" stroke="{COLORS["border"]}"/>'
+            f'<text x="{x0 - 6}" y="{_fmt(y + 4)}" fill="{COLORS["textMuted"]}" font-size="10" '
+            f'text-anchor="end">{_fmt(val)}</text>'
+        )
+    parts.append(
+        f'<text x="14" y="{(y0 + y1) / 2}" fill="{COLORS["textSecondary"]}" font-size="11" '
+        f'text-anchor="middle" transform="rotate(-90 14 {(y0 + y1) / 2})">{escape(y_label)}</text>'
+    )
+    return "".join(parts)
+
+
+def _scale_y(val, y_max):
+    y0, y1 = HEIGHT - MARGIN["b"], MARGIN["t"]
+    return y0 - (y0 - y1) * (val / y_max if y_max else 0)
+
+
+def _x_label(x, texte):
+    return (
+        f'<text x="{_fmt(x)}" y="{HEIGHT - MARGIN["b"] + 16}" fill="{COLORS["textMuted"]}" '
+        f'font-size="10" text-anchor="middle">{escape(str(texte))}</text>'
+    )
+
+
+# ============================================
+# PANNEAUX
+# ============================================
+
+def render_trajectory_svg(data):
+    """
+    Trajectoire ZAN : consommation cumulée réelle vs trajectoire maximale
+
+    Args:
+        data: Sortie de get_trajectory_data
+
+    Returns:
+        Document SVG (str)
+    """
+    annees = data["annees_projection"]
+    y_max = _nice_max(max(data["trajectoire_max"] + data["conso_reelle"] + [data["enveloppe"]]) * 1.1)
+    x0, x1 = MARGIN["l"], WIDTH - MARGIN["r"]
+    a0, a1 = annees[0], annees[-1]
+
+    def x_of(annee):
+        return x0 + (x1 - x0) * (annee - a0) / ((a1 - a0) or 1)
+
+    def polyline(xs, ys):
+        return " ".join(f"{_fmt(x_of(a))},{_fmt(_scale_y(v, y_max))}" for a, v in zip(xs, ys))
+
+    parts = [_axes(y_max, "Hectares cumulés")]
+    parts.extend(_x_label(x_of(a), a) for a in annees)
+    parts.append(
+        f'<polyline points="{polyline(annees, data["trajectoire_max"])}" fill="none" '
+        f'stroke="{COLORS["orange"]}" stroke-width="2" stroke-dasharray="6 4"/>'
+    )
+    parts.append(
+        f'<polyline points="{polyline(data["annees_reelles"], data["conso_reelle"])}" fill="none" '
+        f'stroke="{COLORS["blue"]}" stroke-width="3"/>'
+    )
+    for a, v in zip(data["annees_reelles"], data["conso_reelle"]):
+        parts.append(
+            f'<circle cx="{_fmt(x_of(a))}" cy="{_fmt(_scale_y(v, y_max))}" r="4" fill="{COLORS["blue"]}"/>'
+        )
+    parts.append(
+        f'<text x="{x1}" y="{MARGIN["t"] - 6}" fill="{COLORS["textSecondary"]}" font-size="11" '
+        f'text-anchor="end">Enveloppe 2021-2031 : {_fmt(data["enveloppe"])} ha</text>'
+    )
+    return _svg("".join(parts), "TRAJECTOIRE ZAN")
+
+
+def render_evolution_svg(data):
+    """
+    Évolution annuelle de la consommation d'espaces NAF (barres + moyenne)
+
+    Args:
+        data: Sortie de get_evolution_data
+
+    Returns:
+        Document SVG (str)
+    """
+    periodes, valeurs = data["periodes"], data["consommations"]
+    if not valeurs:
+        return _svg("", "ÉVOLUTION DE LA CONSOMMATION D'ESPACES NAF")
+
+    y_max = _nice_max(max(valeurs) * 1.2)
+    x0, x1 = MARGIN["l"], WIDTH - MARGIN["r"]
+    pas = (x1 - x0) / len(valeurs)
+    largeur = pas * 0.7
+    y_base = _scale_y(0, y_max)
+
+    parts = [_axes(y_max, "Hectares")]
+    for i, (annee, val) in enumerate(zip(periodes, valeurs)):
+        cx = x0 + pas * (i + 0.5)
+        y = _scale_y(val, y_max)
+        couleur = COLORS["blue"] if int(annee) <= 2021 else COLORS["purple"]
+        parts.append(
+            f'<rect x="{_fmt(cx - largeur / 2)}" y="{_fmt(y)}" width="{_fmt(largeur)}" '
+            f'height="{_fmt(y_base - y)}" fill="{couleur}"/>'
+            f'<text x="{_fmt(cx)}" y="{_fmt(y - 4)}" fill="{COLORS["textPrimary"]}" font-size="9" '
+            f'text-anchor="middle">{val:.1f}</text>'
+        )
+        parts.append(_x_label(cx, annee))
+
+    moyenne = sum(valeurs) / len(valeurs)
+    y_moy = _fmt(_scale_y(moyenne, y_max))
+    parts.append(
+        f'<line x1="{x0}" y1="{y_moy}" x2="{x1}" y2="{y_moy}" stroke="#E74C3C" '
+        f'stroke-width="2" stroke-dasharray="6 4"/>'
+        f'<text x="{x1}" y="{MARGIN["t"] - 6}" fill="{COLORS["textSecondary"]}" font-size="11" '
+        f'text-anchor="end">Moyenne : {moyenne:.1f} ha/an</text>'
+    )
+    return _svg("".join(parts), "ÉVOLUTION DE LA CONSOMMATION D'ESPACES NAF")
+
+
+def render_repartition_svg(data):
+    """
+    Répartition par destination (donut + légende)
+
+    Args:
+        data: Sortie de get_repartition_data
+
+    Returns:
+        Document SVG (str)
+    """
+    labels = list(data.keys())
+    valeurs = [max(0, v) for v in data.values()]
+    couleurs = [COLORS["green"], COLORS["orange"], COLORS["blue"], COLORS["gray"]]
+    total = sum(valeurs)
+    cx, cy, r, r_int = 190, HEIGHT / 2 + 15, 120, 70
+
+    parts = []
+    if total <= 0:
+        parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{COLORS["gray"]}"/>')
+    else:
+        angle = -math.pi / 2
+        for val, couleur in zip(valeurs, couleurs):
+            if val <= 0:
+                continue
+            fin = angle + 2 * math.pi * val / total
+            if val >= total:
+                # Secteur unique : deux demi-arcs (un arc de 360° ne se dessine pas)
+                parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{couleur}"/>')
+            else:
+                grand_arc = 1 if fin - angle > math.pi else 0
+                x1, y1 = cx + r * math.cos(angle), cy + r * math.sin(angle)
+                x2, y2 = cx + r * math.cos(fin), cy + r * math.sin(fin)
+                parts.append(
+                    f'<path d="M{cx},{_fmt(cy)} L{_fmt(x1)},{_fmt(y1)} '
+                    f'A{r},{r} 0 {grand_arc},1 {_fmt(x2)},{_fmt(y2)} Z" fill="{couleur}" '
+                    f'stroke="{COLORS["bgSecondary"]}" stroke-width="1"/>'
+                )
+            angle = fin
+    parts.append(
+        f'<circle cx="{cx}" cy="{_fmt(cy)}" r="{r_int}" fill="{COLORS["bgPrimary"]}"/>'
+        f'<text x="{cx}" y="{_fmt(cy + 7)}" fill="{COLORS["textPrimary"]}" font-size="20" '
+        f'font-weight="bold" text-anchor="middle">{total:.0f} ha</text>'
+    )
+
+    for i, (label, val, couleur) in enumerate(zip(labels, valeurs, couleurs)):
+        y = 110 + i * 40
+        pct = val / total * 100 if total > 0 else 0
+        parts.append(
+            f'<rect x="370" y="{y - 12}" width="14" height="14" fill="{couleur}"/>'
+            f'<text x="392" y="{y}" fill="{COLORS["textSecondary"]}" font-size="13">{escape(label)}</text>'
+            f'<text x="{WIDTH - 30}" y="{y}" fill="{COLORS["textPrimary"]}" font-size="13" '
+            f'text-anchor="end">{val:.1f} ha ({pct:.0f}%)</text>'
+        )
+    return _svg("".join(parts), "RÉPARTITION PAR DESTINATION")
+
+
+def render_radar_svg(data):
+    """
+    Radar de benchmark SCoT vs CCPDA (valeurs normalisées 0-100)
+
+    Args:
+        data: Sortie de get_benchmark_data
+
+    Returns:
+        Document SVG (str)
+    """
+    categories = data["categories"]
+    cx, cy, r = WIDTH / 2, HEIGHT / 2 + 10, 115
+    n = len(categories)
+
+    def point(i, val):
+        angle = -math.pi / 2 + 2 * math.pi * i / n
+        return cx + r * val / 100 * math.cos(angle), cy + r * val / 100 * math.sin(angle)
+
+    def polygone(valeurs):
+        return " ".join(f"{_fmt(x)},{_fmt(y)}" for x, y in (point(i, v) for i, v in enumerate(valeurs)))
+
+    parts = []
+    for niveau in (25, 50, 75, 100):
+        parts.append(
+            f'<polygon points="{polygone([niveau] * n)}" fill="none" stroke="{COLORS["border"]}"/>'
+        )
+    for i, categorie in enumerate(categories):
+        x, y = point(i, 100)
+        lx, ly = point(i, 118)
+        ancre = "middle" if abs(lx - cx) < 5 else ("start" if lx > cx else "end")
+        parts.append(
+            f'<line x1="{_fmt(cx)}" y1="{_fmt(cy)}" x2="{_fmt(x)}" y2="{_fmt(y)}" stroke="{COLORS["border"]}"/>'
+            f'<text x="{_fmt(lx)}" y="{_fmt(ly + 4)}" fill="{COLORS["textSecondary"]}" font-size="11" '
+            f'text-anchor="{ancre}">{escape(categorie)}</text>'
+        )
+    series = [
+        (data["scot"], data["scot_label"], COLORS["blue"], "rgba(46,134,171,0.3)"),
+        (data["ccpda"], data["ccpda_label"], COLORS["purple"], "rgba(162,59,114,0.3)"),
+    ]
+    for k, (valeurs, label, couleur, remplissage) in enumerate(series):
+        parts.append(
+            f'<polygon points="{polygone(valeurs)}" fill="{remplissage}" stroke="{couleur}" stroke-width="2"/>'
+            f'<rect x="{20}" y="{HEIGHT - 44 + k * 20}" width="12" height="12" fill="{couleur}"/>'
+            f'<text x="38" y="{HEIGHT - 34 + k * 20}" fill="{COLORS["textSecondary"]}" '
+            f'font-size="11">{escape(label)}</text>'
+        )
+    return _svg("".join(parts), "BENCHMARK DES PÉRIMÈTRES")
+
+
+# Panneau -> fonction de rendu (les données viennent des fonctions de app.py)
+RENDERERS = {
+    "trajectory": render_trajectory_svg,
+    "evolution": render_evolution_svg,
+    "repartition": render_repartition_svg,
+    "radar": render_radar_svg,
+}
+
+
+# ============================================
+# RAPPORT STATIQUE
+# ============================================
+
+REPORT_CSS = f"""
+body {{ background: {COLORS["bgSecondary"]}; color: {COLORS["textPrimary"]};
+       font-family: "Segoe UI", Roboto, sans-serif; margin: 2rem; }}
+h1 {{ margin-bottom: 0.2rem; }}
+.kpis {{ display: flex; flex-wrap: wrap; gap: 1rem; margin: 1.5rem 0; }}
+.kpi {{ background: {COLORS["bgPrimary"]}; border: 1px solid {COLORS["border"]};
+        border-radius: 8px; padding: 0.8rem 1.2rem; }}
+.kpi b {{ display: block; font-size: 1.4rem; }}
+.kpi span {{ color: {COLORS["textMuted"]}; font-size: 0.85rem; }}
+.panels {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(320px, 1fr)); gap: 1rem; }}
+.panels svg {{ width: 100%; height: auto; border-radius: 8px; }}
+footer {{ color: {COLORS["textMuted"]}; font-size: 0.8rem; margin-top: 2rem; }}
+@media print {{
+  body {{ margin: 0; }}
+  .panels {{ display: block; }}
+  .panels svg {{ page-break-inside: avoid; margin-bottom: 1rem; }}
+}}
+"""
+
+
+def build_report_html(titre, metrics, svgs, footer=""):
+    """
+    Assemble un rapport HTML autonome (SVG en ligne, aucune ressource externe)
+
+    Args:
+        titre: Libellé du périmètre
+        metrics: Sortie de calculate_metrics
+        svgs: Dictionnaire panneau -> document SVG
+        footer: Texte de pied de page (source des données)
+
+    Returns:
+        Document HTML (str)
+    """
+    kpis = [
+        ("Artificialisation 2009-2024", f'{metrics["artif_total_ha"]:.1f} ha'),
+        ("Population 2021", f'{metrics["population"]:,}'.replace(",", " ")),
+        ("Enveloppe ZAN 2021-2031", f'{metrics["enveloppe_zan"]:.1f} ha'),
+        ("Consommé 2021-2024", f'{metrics["conso_2021_2024"]:.1f} ha'),
+        ("Taux de l'enveloppe", f'{metrics["taux_enveloppe"]:.1f} %'),
+        ("Communes", str(metrics["nb_communes"])),
+    ]
+    kpis_html = "".join(
+        f'<div class="kpi"><b>{escape(val)}</b><span>{escape(label)}</span></div>' for label, val in kpis
+    )
+    panels_html = "".join(svgs.values())
+    return (
+        '<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8">'
+        f"<title>Rapport ZAN - {escape(titre)}</title><style>{REPORT_CSS}</style></head>"
+        f"<body><h1>{escape(titre)}</h1><div class=\"kpis\">{kpis_html}</div>"
+        f'<div class="panels">{panels_html}</div><footer>{escape(footer)}</footer></body></html>'
+    )
+
+
+def _render_perimetre(perimetre, output_dir):
+    """Tâche d'un worker : rend tous les panneaux d'un périmètre et écrit son rapport"""
+    import app
+
+    app.init_data()
+    html = app.render_report(perimetre)
+    if html is None:
+        # Données indisponibles ou périmètre vide : signalé par generate_reports
+        return perimetre, app.get_perimetre_label(perimetre), None
+    path = Path(output_dir) / f"rapport_{perimetre}.html"
+    path.write_text(html, encoding="utf-8")
+    return perimetre, app.get_perimetre_label(perimetre), path.name
+
+
+def generate_reports(perimetres, output_dir=DEFAULT_OUTPUT_DIR, workers=None, log=print):
+    """
+    Écrit un rapport HTML statique par périmètre, en parallèle, plus un index
+
+    Args:
+        perimetres: Identifiants de périmètres (voir /api/perimetres)
+        output_dir: Répertoire de sortie
+        workers: Nombre de processus (défaut : nombre de CPU)
+        log: Fonction d'affichage de la progression
+
+    Returns:
+        Liste des fichiers écrits (noms relatifs à output_dir)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    debut = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        resultats = list(pool.map(_render_perimetre, perimetres, [str(output_dir)] * len(perimetres)))
+
+    for perimetre, label, fichier in resultats:
+        if fichier is None:
+            log(f"Périmètre {perimetre} ({label}) ignoré : données non disponibles")
+    resultats = [r for r in resultats if r[2] is not None]
+
+    liens = "".join(
+        f'<li><a href="{escape(fichier)}">{escape(label)}</a></li>' for _, label, fichier in resultats
+    )
+    (output_dir / "index.html").write_text(
+        '<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>Rapports ZAN</title>'
+        f"<style>{REPORT_CSS} a {{ color: {COLORS['blue']}; }}</style></head>"
+        f"<body><h1>Rapports ZAN</h1><ul>{liens}</ul></body></html>",
+        encoding="utf-8",
+    )
+
+    log(f"{len(resultats)} rapports écrits dans {output_dir} en {time.perf_counter() - debut:.2f} s")
+    return [fichier for _, _, fichier in resultats] + ["index.html"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génération des rapports ZAN statiques")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT_DIR), help="Répertoire de sortie")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus")
+    parser.add_argument(
+        "--perimetres", nargs="*", default=None,
+        help="Identifiants de périmètres (défaut : tous ceux de /api/perimetres)",
+    )
+    args = parser.parse_args(argv)
+
+    # Journal des requêtes en mémoire uniquement : le batch ne doit pas alimenter
+    # les statistiques de popularité des filtres (variable héritée par les workers)
+    os.environ["ZAN_QUERY_LOG"] = ""
+
+    perimetres = args.perimetres
+    if not perimetres:
+        import app
+        perimetres = app.list_perimetres()
+
+    generate_reports(perimetres, args.output, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Schéma typé du fichier national de consommation d'espaces NAF
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+# pandas est importé dans les fonctions qui l'utilisent : importer le schéma (ou
+# app.py) ne charge pas pandas tant qu'aucune donnée n'est lue
+
+
+# ============================================
+# DÉCLARATION DES COLONNES
+# ============================================
+
+# Années de début des flux annuels : naf09art10 (2009-2010) ... naf23art24 (2023-2024)
+ANNEES_FLUX = range(9, 24)
+
+# Destinations de l'artificialisation : activité, habitat, mixte, routes, ferré, inconnu
+DESTINATIONS = ["act", "hab", "mix", "rou", "fer", "inc"]
+
+COLS_NAF_ANNUELLES = [f"naf{a:02d}art{a + 1:02d}" for a in ANNEES_FLUX]
+COLS_DESTINATIONS_ANNUELLES = [
+    f"art{a:02d}{dest}{a + 1:02d}" for a in ANNEES_FLUX for dest in DESTINATIONS
+]
+COLS_TOTAUX = ["naf09art24"] + [f"art09{dest}24" for dest in DESTINATIONS]
+
+COLS_DEMOGRAPHIE = [
+    "pop15", "pop21", "pop1521",
+    "men15", "men21", "men1521",
+    "emp15", "emp21", "emp1521",
+]
+
+# Identifiants et libellés territoriaux : peu de modalités, stockés en catégories
+COLS_CATEGORIES = [
+    "idcomtxt", "idreg", "idregtxt", "iddep", "iddeptxt",
+    "epci24", "epci24txt", "scot", "aav2020", "aav2020txt", "aav2020_typo",
+]
+
+# Schéma complet : colonne -> dtype. Les colonnes absentes du schéma sont ignorées
+SCHEMA = {"idcom": "str"}
+SCHEMA.update({col: "category" for col in COLS_CATEGORIES})
+# Flux en m² et effectifs : entiers, largement sous la borne int32
+SCHEMA.update({col: "int32" for col in COLS_NAF_ANNUELLES})
+SCHEMA.update({col: "int32" for col in COLS_DESTINATIONS_ANNUELLES})
+SCHEMA.update({col: "int32" for col in COLS_TOTAUX})
+SCHEMA.update({col: "int32" for col in COLS_DEMOGRAPHIE})
+SCHEMA["surfcom2024"] = "float32"
+# Exposée telle quelle par l'API (sommes et arrondis) : on garde la double précision
+SCHEMA["artif_total_ha"] = "float64"
+
+# Bornes des colonnes int32, vérifiées par validate_schema avant conversion
+INT32_MIN = int(np.iinfo(np.int32).min)
+INT32_MAX = int(np.iinfo(np.int32).max)
+
+# Colonnes sans lesquelles le tableau de bord ne peut pas fonctionner
+COLS_OBLIGATOIRES = [
+    "idcom", "idcomtxt", "iddeptxt", "aav2020_typo", "naf09art24", "pop21", "pop1521",
+]
+
+COLS_NUMERIQUES = [col for col, dtype in SCHEMA.items() if dtype not in ("str", "category")]
+
+# Mesures additives (flux en m² et effectifs), sommables sur n'importe quel groupe de communes
+COLS_MESURES = [col for col, dtype in SCHEMA.items() if dtype == "int32"]
+
+
+class SchemaError(ValueError):
+    """Erreur de validation du fichier de données, avec la liste des anomalies"""
+
+    def __init__(self, erreurs, source=None):
+        self.erreurs = list(erreurs)
+        self.source = source
+        entete = f"Fichier {source} invalide" if source else "Données invalides"
+        super().__init__(entete + " :\n- " + "\n- ".join(self.erreurs))
+
+
+# ============================================
+# LECTURE ET TYPAGE
+# ============================================
+
+def read_csv_kwargs():
+    """
+    Paramètres de lecture communs aux fichiers de l'Observatoire
+
+    Returns:
+        Dictionnaire à passer à pd.read_csv
+    """
+    return {
+        "sep": ";",
+        "encoding": "utf-8-sig",
+        # Les colonnes hors schéma ne sont jamais parsées
+        "usecols": lambda col: col in SCHEMA,
+        # Les identifiants sont lus en texte pour conserver les zéros de tête (07009)
+        "dtype": {col: "str" for col, dtype in SCHEMA.items() if dtype in ("str", "category")},
+    }
+
+
+def validate_schema(df, source=None):
+    """
+    Vérifie les colonnes et les valeurs numériques avant conversion
+
+    Toutes les anomalies sont collectées puis remontées en une seule fois.
+    Les cellules vides sont acceptées (remplacées par 0), les textes non numériques non.
+
+    Args:
+        df: DataFrame brut issu de la lecture du CSV
+        source: Nom du fichier, pour les messages d'erreur
+
+    Raises:
+        SchemaError: si au moins une anomalie est détectée
+    """
+    import pandas as pd
+
+    erreurs = []
+
+    manquantes = [col for col in COLS_OBLIGATOIRES if col not in df.columns]
+    if manquantes:
+        erreurs.append(f"colonnes obligatoires absentes : {', '.join(manquantes)}")
+
+    for col in COLS_NUMERIQUES:
+        if col not in df.columns:
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            valeurs = df[col]
+        else:
+            valeurs = pd.to_numeric(df[col], errors="coerce")
+            invalides = valeurs.isna() & df[col].notna()
+            if invalides.any():
+                exemples = ", ".join(repr(v) for v in df.loc[invalides, col].unique()[:3])
+                erreurs.append(f"{col} : {int(invalides.sum())} valeur(s) non numérique(s) ({exemples})")
+
+        # apply_schema convertit en int32 sans contrôle : une valeur hors bornes y
+        # serait tronquée silencieusement
+        if SCHEMA[col] == "int32":
+            arrondies = valeurs.round()
+            hors_bornes = (arrondies < INT32_MIN) | (arrondies > INT32_MAX)
+            if hors_bornes.any():
+                exemples = ", ".join(repr(v) for v in valeurs[hors_bornes].unique()[:3].tolist())
+                erreurs.append(f"{col} : {int(hors_bornes.sum())} valeur(s) hors des bornes int32 ({exemples})")
+
+    if erreurs:
+        raise SchemaError(erreurs, source)
+
+
+def apply_schema(df):
+    """
+    Convertit les colonnes vers les dtypes déclarés et supprime les colonnes inutilisées
+
+    Args:
+        df: DataFrame validé par validate_schema
+
+    Returns:
+        DataFrame typé (nouvel objet)
+    """
+    import pandas as pd
+
+    # Colonnes converties une à une puis assemblées en un seul DataFrame : des
+    # réaffectations successives (df[col] = ...) laisseraient un bloc par colonne
+    colonnes = {}
+    for col in df.columns:
+        if col not in SCHEMA:
+            continue
+        dtype = SCHEMA[col]
+        if dtype == "category":
+            colonnes[col] = df[col].astype("category")
+        elif dtype == "str":
+            colonnes[col] = df[col].astype(str)
+        else:
+            valeurs = pd.to_numeric(df[col], errors="coerce").fillna(0)
+            if dtype == "int32":
+                valeurs = valeurs.round()
+            colonnes[col] = valeurs.astype(dtype)
+
+    if "artif_total_ha" not in colonnes and "naf09art24" in colonnes:
+        colonnes["artif_total_ha"] = colonnes["naf09art24"].astype(np.float64) / 10000
+
+    df = pd.DataFrame(colonnes, index=df.index)
+
+    return df
+
+
+def read_observatoire_csv(path):
+    """
+    Lit, valide et type un fichier CSV de l'Observatoire
+
+    Args:
+        path: Chemin du fichier CSV (séparateur ;)
+
+    Returns:
+        DataFrame typé selon SCHEMA
+
+    Raises:
+        SchemaError: si le fichier ne respecte pas le schéma
+    """
+    import pandas as pd
+
+    path = Path(path)
+    df = pd.read_csv(path, **read_csv_kwargs())
+    validate_schema(df, source=path.name)
+    return apply_schema(df)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Index de recherche des communes (autocomplétion)
+
+Recherche par préfixe insensible aux accents et à la casse sur le nom des
+communes (début de n'importe quel mot : « roches » trouve « Les Roches-de-Condrieu »)
+et par préfixe de code INSEE. Les résultats sont classés par population.
+"""
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+
+# Nombre maximal de résultats renvoyés
+MAX_RESULTATS = 50
+# Les préfixes correspondant à plus d'entrées que ce seuil ont leurs résultats
+# précalculés : une recherche ne classe donc jamais plus de SEUIL_PRECALCUL entrées
+SEUIL_PRECALCUL = 64
+
+_SEPARATEURS = re.compile(r"[\s\-'’]+")
+_CODE_INSEE = re.compile(r"^(\d|2[AaBb])[\dAaBb]{0,4}$")
+
+
+def fold(texte: str) -> str:
+    """
+    Normalise un texte pour la recherche : sans accents, minuscules, mots séparés par un espace
+
+    Returns:
+        Texte normalisé (« Saint-Étienne » -> « saint etienne »)
+    """
+    texte = unicodedata.normalize("NFKD", str(texte))
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return _SEPARATEURS.sub(" ", texte.casefold()).strip()
+
+
+class CommuneIndex:
+    """Index trié (bisect) des noms normalisés et des codes INSEE d'un périmètre"""
+
+    def __init__(self, df):
+        self._codes = df["idcom"].astype(str).str.zfill(5).to_numpy()
+        self._noms = df["idcomtxt"].astype(str).to_numpy()
+        self._deps = df["iddeptxt"].astype(str).to_numpy() if "iddeptxt" in df.columns else None
+        self._pops = df["pop21"].to_numpy(dtype=np.int64) if "pop21" in df.columns else np.zeros(len(df), np.int64)
+
+        # Rang de chaque commune dans l'ordre de population décroissante : les
+        # résultats sont triés sur ce rang (un entier) plutôt que sur la population
+        ordre = np.argsort(-self._pops, kind="stable")
+        self._rang = np.empty(len(df), dtype=np.int64)
+        self._rang[ordre] = np.arange(len(df))
+
+        # Une entrée par début de mot : (suffixe normalisé, rang, ligne)
+        entrees = []
+        for ligne, nom in enumerate(self._noms):
+            cle = fold(nom)
+            debut = 0
+            for mot in cle.split(" "):
+                entrees.append((cle[debut:], int(self._rang[ligne]), ligne))
+                debut += len(mot) + 1
+        entrees.sort()
+        self._cles = [e[0] for e in entrees]
+        self._lignes = [e[2] for e in entrees]
+
+        codes_tries = sorted((code, ligne) for ligne, code in enumerate(self._codes))
+        self._cles_codes = [c for c, _ in codes_tries]
+        self._lignes_codes = [ligne for _, ligne in codes_tries]
+
+        self._precalcul = self._precalculer(self._cles, self._lignes)
+        self._precalcul_codes = self._precalculer(self._cles_codes, self._lignes_codes)
+
+    def _precalculer(self, cles, lignes):
+        """
+        Précalcule les résultats des préfixes trop fréquents, en allongeant le
+        préfixe tant que la plage correspondante dépasse le seuil
+        """
+        precalcul = {}
+        plages = [(0, len(cles))]
+        longueur = 1
+        while plages:
+            suivantes = []
+            for debut, fin in plages:
+                i = debut
+                while i < fin:
+                    prefixe = cles[i][:longueur]
+                    if len(prefixe) < longueur:
+                        # Clé plus courte que le préfixe : déjà couverte au niveau précédent
+                        i += 1
+                        continue
+                    j = bisect_right(cles, prefixe + "\uffff", lo=i, hi=fin)
+                    if j - i > SEUIL_PRECALCUL:
+                        precalcul[prefixe] = self._classer(lignes[i:j], MAX_RESULTATS)
+                        suivantes.append((i, j))
+                    i = j
+            plages = suivantes
+            longueur += 1
+        return precalcul
+
+    @staticmethod
+    def _plage(cles, lignes, prefixe):
+        """Lignes dont la clé commence par le préfixe (deux bisect sur la liste triée)"""
+        debut = bisect_left(cles, prefixe)
+        fin = bisect_right(cles, prefixe + "\uffff", lo=debut)
+        return lignes[debut:fin]
+
+    def _classer(self, lignes, limit):
+        """Lignes uniques classées par population décroissante"""
+        return heapq.nsmallest(limit, set(lignes), key=self._rang.__getitem__)
+
+    def _resultat(self, ligne):
+        return {
+            "code_insee": self._codes[ligne],
+            "commune": self._noms[ligne],
+            "departement": self._deps[ligne] if self._deps is not None else None,
+            "population": int(self._pops[ligne]),
+        }
+
+    def search(self, requete, limit=10):
+        """
+        Recherche les communes correspondant à un préfixe de nom ou de code INSEE
+
+        Args:
+            requete: Texte saisi (nom partiel ou code INSEE partiel)
+            limit: Nombre maximal de résultats
+
+        Returns:
+            Liste de dictionnaires (code_insee, commune, departement, population)
+        """
+        requete = (requete or "").strip()
+        if not requete or limit <= 0:
+            return []
+        limit = min(limit, MAX_RESULTATS)
+
+        if _CODE_INSEE.match(requete):
+            prefixe = requete.upper()
+            cles, index, precalcul = self._cles_codes, self._lignes_codes, self._precalcul_codes
+        else:
+            prefixe = fold(requete)
+            if not prefixe:
+                # Requête faite uniquement de séparateurs (« ' », « - ») : préfixe vide
+                return []
+            cles, index, precalcul = self._cles, self._lignes, self._precalcul
+
+        if prefixe in precalcul:
+            lignes = precalcul[prefixe][:limit]
+        else:
+            lignes = self._classer(self._plage(cles, index, prefixe), limit)
+        return [self._resultat(ligne) for ligne in lignes]
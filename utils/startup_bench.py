@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure du temps de démarrage de l'application
+
+Deux mesures, chacune dans un processus Python neuf :
+- profil d'import de app.py (python -X importtime) : modules les plus coûteux ;
+- délai entre le lancement du processus et la première requête servie, découpé
+  en phases (interpréteur, import de app, create_app, première requête).
+
+La requête passe par le client de test Flask (pile WSGI complète, sans réseau).
+Le journal des requêtes est désactivé dans les processus mesurés (ZAN_QUERY_LOG
+vide) sauf si la variable est déjà définie.
+
+Usage :
+    python -m utils.startup_bench [--repeat 5] [--url /api/metrics] [--output startup.jsonl]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_URL = "/api/metrics?perimetre=scot"
+DEFAULT_REPEAT = 5
+# Nombre de modules affichés dans le profil d'import
+TOP_IMPORTS = 10
+
+# Processus mesuré : horodatages (time.time) à chaque phase, écrits en JSON sur stdout
+_CHILD = """
+import json, sys, time
+t_start = time.time()
+import app
+t_import = time.time()
+application = app.create_app()
+t_init = time.time()
+response = application.test_client().get(sys.argv[1])
+t_request = time.time()
+print(json.dumps({
+    "start": t_start, "import": t_import, "init": t_init, "request": t_request,
+    "status": response.status_code, "data_loaded": app.DATA_LOADED,
+}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("ZAN_QUERY_LOG", "")
+    return env
+
+
+def parse_importtime(stderr):
+    """
+    Analyse la sortie de python -X importtime
+
+    Returns:
+        Liste de (module, temps propre µs, temps cumulé µs, profondeur)
+    """
+    modules = []
+    for ligne in stderr.splitlines():
+        if not ligne.startswith("import time:"):
+            continue
+        try:
+            propre, cumule, nom = ligne[len("import time:"):].split("|")
+            profondeur = (len(nom) - len(nom.lstrip(" ")) - 1) // 2
+            modules.append((nom.strip(), int(propre), int(cumule), profondeur))
+        except ValueError:
+            # Ligne d'en-tête (self [us] | cumulative | imported package)
+            continue
+    return modules
+
+
+def profile_import(python=sys.executable):
+    """
+    Profil d'import de app.py dans un processus neuf
+
+    Returns:
+        Dictionnaire : temps cumulé de app (ms) et imports directs les plus coûteux
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    fin = next((i for i, m in enumerate(modules) if m[0] == "app" and m[3] == 0), None)
+    total, directs = None, []
+    if fin is not None:
+        total = modules[fin][2]
+        # Les sous-modules sont listés avant leur parent : le sous-arbre de app est
+        # la suite de lignes de profondeur > 0 qui précède la sienne
+        debut = fin
+        while debut > 0 and modules[debut - 1][3] > 0:
+            debut -= 1
+        directs = [m for m in modules[debut:fin] if m[3] == 1]
+        directs = sorted(directs, key=lambda m: -m[2])[:TOP_IMPORTS]
+    return {
+        "import_app_ms": round(total / 1000, 1) if total is not None else None,
+        "modules": [{"module": nom, "cumule_ms": round(cumule / 1000, 1)} for nom, _, cumule, _ in directs],
+        "charges": sorted({nom.split(".")[0] for nom, _, _, _ in modules}),
+    }
+
+
+def measure_first_request(url=DEFAULT_URL, python=sys.executable):
+    """
+    Lance un processus neuf et mesure le délai jusqu'à la première requête servie
+
+    Returns:
+        Dictionnaire des durées par phase (ms), code HTTP et état des données
+    """
+    t0 = time.time()
+    result = subprocess.run(
+        [python, "-c", _CHILD, url],
+        cwd=ROOT_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    t_fin = time.time()
+    mesures = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "interpreteur_ms": round((mesures["start"] - t0) * 1000, 1),
+        "import_ms": round((mesures["import"] - mesures["start"]) * 1000, 1),
+        "init_ms": round((mesures["init"] - mesures["import"]) * 1000, 1),
+        "requete_ms": round((mesures["request"] - mesures["init"]) * 1000, 1),
+        "premiere_requete_ms": round((mesures["request"] - t0) * 1000, 1),
+        "processus_ms": round((t_fin - t0) * 1000, 1),
+        "status": mesures["status"],
+        "data_loaded": mesures["data_loaded"],
+    }
+
+
+def run_benchmark(url=DEFAULT_URL, repeat=DEFAULT_REPEAT):
+    """
+    Profil d'import puis `repeat` démarrages mesurés (médiane par phase)
+
+    Returns:
+        Dictionnaire sérialisable en JSON
+    """
+    essais = [measure_first_request(url) for _ in range(max(1, repeat))]
+    phases = [k for k, v in essais[0].items() if k.endswith("_ms")]
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "url": url,
+        "repetitions": len(essais),
+        "status": essais[-1]["status"],
+        "data_loaded": essais[-1]["data_loaded"],
+        "median": {k: round(statistics.median(e[k] for e in essais), 1) for k in phases},
+        "min": {k: min(e[k] for e in essais) for k in phases},
+        "import": profile_import(),
+    }
+
+
+def format_report(resultat):
+    """Rapport texte du benchmark"""
+    lignes = [
+        f"Démarrage -> première requête ({resultat['url']}, HTTP {resultat['status']}, "
+        f"médiane sur {resultat['repetitions']}) :",
+    ]
+    for phase, valeur in resultat["median"].items():
+        lignes.append(f"  {phase:<22}{valeur:>9.1f} ms   (min {resultat['min'][phase]:.1f})")
+    profil = resultat["import"]
+    lignes.append(f"Import de app (-X importtime) : {profil['import_app_ms']} ms")
+    for module in profil["modules"]:
+        lignes.append(f"  {module['module']:<40}{module['cumule_ms']:>9.1f} ms")
+    for lourd in ("pandas", "requests"):
+        etat = "chargé" if lourd in profil["charges"] else "non chargé"
+        lignes.append(f"  {lourd} à l'import : {etat}")
+    return "\n".join(lignes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure du temps de démarrage de l'application ZAN")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Première requête servie")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Nombre de démarrages mesurés")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    parser.add_argument("--output", default=None, help="Fichier JSONL auquel ajouter le résultat (suivi)")
+    args = parser.parse_args(argv)
+
+    try:
+        resultat = run_benchmark(args.url, args.repeat)
+    except subprocess.CalledProcessError as e:
+        print(e.stderr, file=sys.stderr)
+        return 1
+
+    print(json.dumps(resultat, ensure_ascii=False, indent=1) if args.json else format_report(resultat))
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(resultat, ensure_ascii=False) + "\n")
+    return 0 if resultat["status"] == 200 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())